@@ -14,6 +14,7 @@ from flask import Flask, jsonify, render_template, request, redirect, url_for, s
 import subprocess
 import json
 import time
+import threading
 import datetime  # <--- THIS WAS MISSING. ADD THIS LINE.
 from werkzeug.utils import secure_filename
 import pytz 
@@ -22,6 +23,9 @@ from flask import send_from_directory
 
 # Import from the sibling folder 'scripts'
 from scripts import upload_to_youtube 
+from scripts import governor
+from scripts import video_fingerprint
+from scripts import download_index
 
 app = Flask(__name__)
 app.secret_key = "supersecretkey"
@@ -35,6 +39,11 @@ if not os.path.exists(LOG_DIR):
 # --- Process Management ---
 RUNNING_PROCESSES = {}
 FINISHED_LOG = []
+# Heavy tasks waiting for the governor: task_name -> {"kind", "queued_at", "reason"} (FIFO)
+QUEUED_TASKS = {}
+PROCESS_LOCK = threading.RLock() # Shared by request handlers and the queue dispatcher
+GOVERNOR_POLL_SECONDS = 5
+_dispatcher_thread = None
 
 # -------------------------
 # Utility Functions
@@ -96,6 +105,7 @@ def start_python_task(task_name, controller_data):
         print(f"[Error][start_task] Script file not found: {script_abs_path}", flush=True)
         return None, None, None
 
+    heavy_kind = governor.get_task_kind(script_abs_path, script_args)
     command = [ sys.executable, "-u", script_filename ]
     command.extend(script_args)
     needs_controller_arg = "--category" in script_args
@@ -126,9 +136,13 @@ def start_python_task(task_name, controller_data):
             text=True,
             encoding='utf-8',     # Specify UTF-8 encoding
             errors='replace',     # Replace undecodable chars
-            env=env
+            env=env,
+            **(governor.get_popen_priority_kwargs() if heavy_kind else {})
         )
         print(f"[DEBUG][start_task] Popen executed. Process: {process}", flush=True)
+        if heavy_kind:
+            # Heavy jobs run at lower CPU/IO priority so the dashboard stays responsive
+            governor.lower_process_priority(process.pid)
 
         time.sleep(0.2)
         poll_result = process.poll()
@@ -173,6 +187,10 @@ def add_to_finished_log(name, success, output):
 
 def reap_finished_processes():
     """Checks for finished processes, closes logs, reads output, cleans up."""
+    with PROCESS_LOCK:
+        _reap_finished_processes()
+
+def _reap_finished_processes():
     # Create a copy of keys to iterate safely while modifying dictionary
     for task_name in list(RUNNING_PROCESSES.keys()):
         proc_data = RUNNING_PROCESSES[task_name]
@@ -220,6 +238,68 @@ def reap_finished_processes():
 
             # 5. REMOVE FROM RUNNING LIST
             del RUNNING_PROCESSES[task_name]
+
+# -------------------------
+# Resource Governor (queue for heavy tasks)
+# -------------------------
+def get_task_kind(task_name, controller_data):
+    """Heavy job kind of a controller task (None = light, starts right away)."""
+    task_config = controller_data.get("tasks", {}).get(task_name) or {}
+    return governor.get_task_kind(task_config.get("script"), task_config.get("args"))
+
+def count_running_heavy():
+    return sum(1 for data in RUNNING_PROCESSES.values() if data.get('kind'))
+
+def launch_task(task_name, controller_data, kind=None):
+    """Starts a task and registers it as running. Returns True on success."""
+    process, log_file, log_handle = start_python_task(task_name, controller_data)
+    if not process:
+        if log_handle:
+            try: log_handle.close()
+            except: pass
+        if log_file and os.path.exists(log_file):
+            try: os.remove(log_file)
+            except: pass
+        return False
+    RUNNING_PROCESSES[task_name] = {'process': process, 'log_file': log_file, 'log_handle': log_handle,
+                                    'kind': kind, 'started_at': datetime.datetime.now()}
+    return True
+
+def dispatch_queued_tasks():
+    """Starts queued heavy tasks (oldest first) while the governor admits them."""
+    with PROCESS_LOCK:
+        _reap_finished_processes()
+        if not QUEUED_TASKS:
+            return
+        controller_data = load_json(CONTROLLER_FILE) or {}
+        limits = governor.get_limits(controller_data.get("global_settings", {}))
+        for task_name in list(QUEUED_TASKS.keys()):
+            queued = QUEUED_TASKS[task_name]
+            admitted, reason = governor.check_capacity(queued['kind'], count_running_heavy(), limits)
+            if not admitted:
+                queued['reason'] = reason
+                break # Keep FIFO order: later tasks wait behind this one
+            del QUEUED_TASKS[task_name]
+            if launch_task(task_name, controller_data, queued['kind']):
+                print(f"[Governor] Started queued task '{task_name}'.", flush=True)
+            else:
+                add_to_finished_log(task_name, False, "--- Failed to start after waiting in the queue ---")
+
+def _governor_loop():
+    while True:
+        time.sleep(GOVERNOR_POLL_SECONDS)
+        try:
+            dispatch_queued_tasks()
+        except Exception as e:
+            print(f"[Error][Governor] Dispatch failed: {e}", flush=True)
+
+def ensure_dispatcher_running():
+    """Starts the background queue dispatcher once (on first use)."""
+    global _dispatcher_thread
+    with PROCESS_LOCK:
+        if _dispatcher_thread is None or not _dispatcher_thread.is_alive():
+            _dispatcher_thread = threading.Thread(target=_governor_loop, name="governor", daemon=True)
+            _dispatcher_thread.start()
 # -------------------------
 # Routes
 # -------------------------
@@ -263,6 +343,15 @@ def gallery():
         
         if img_path: all_paths[os.path.abspath(img_path)] = "Quotes Input Images"
         if aud_path: all_paths[os.path.abspath(aud_path)] = "Quotes Input Audio"
+
+        # Extra output profiles (square cut, preview) render into <output-dir>/<name> unless name=dir
+        out_path = _find_arg_value("--output-dir", args)
+        if out_path and "--output-profiles" in args:
+            for spec in args[args.index("--output-profiles") + 1:]:
+                if spec.startswith("--"): break
+                name, _, custom_dir = spec.partition("=")
+                if name == "short": continue # Already listed as the Quotes upload folder
+                all_paths[os.path.abspath(custom_dir or os.path.join(out_path, name))] = f"Quotes {name.title()} Videos"
     except Exception as e:
         print(f"[Error][Gallery] Could not parse Quotes task paths: {e}", flush=True)
 
@@ -734,23 +823,31 @@ def run_task(task_name):
     if task_name in RUNNING_PROCESSES:
         flash(f"Task '{task_name}' is already running!", "warning")
         return redirect(url_for("monitor"))
+    if task_name in QUEUED_TASKS:
+        flash(f"Task '{task_name}' is already queued.", "warning")
+        return redirect(url_for("monitor"))
     controller_data = load_json(CONTROLLER_FILE)
     if not controller_data:
         flash("Could not load controller.json", "danger")
         return redirect(url_for("dashboard"))
 
-    process, log_file, log_handle = start_python_task(task_name, controller_data)
-    if process:
-        RUNNING_PROCESSES[task_name] = {'process': process, 'log_file': log_file, 'log_handle': log_handle}
-        flash(f"Started task: {task_name}", "success")
-    else:
-        flash(f"Failed to start task: {task_name}", "danger")
-        if 'log_handle' in locals() and log_handle:
-            try: log_handle.close()
-            except: pass
-        if 'log_file' in locals() and log_file and os.path.exists(log_file):
-            try: os.remove(log_file)
-            except: pass
+    with PROCESS_LOCK:
+        # Heavy tasks go through the governor; they queue if the host is busy
+        kind = get_task_kind(task_name, controller_data)
+        if kind:
+            limits = governor.get_limits(controller_data.get("global_settings", {}))
+            admitted, reason = (False, "waiting behind earlier queued tasks") if QUEUED_TASKS else \
+                governor.check_capacity(kind, count_running_heavy(), limits)
+            if not admitted:
+                QUEUED_TASKS[task_name] = {'kind': kind, 'queued_at': datetime.datetime.now(), 'reason': reason}
+                ensure_dispatcher_running()
+                flash(f"Queued task: {task_name} ({reason})", "info")
+                return redirect(url_for("monitor"))
+
+        if launch_task(task_name, controller_data, kind):
+            flash(f"Started task: {task_name}", "success")
+        else:
+            flash(f"Failed to start task: {task_name}", "danger")
     return redirect(url_for("monitor"))
 
 @app.route("/stream_log/<task_name>")
@@ -782,8 +879,19 @@ def stream_log(task_name):
 @app.route("/monitor")
 def monitor():
     if not session.get("logged_in"): return redirect(url_for("login"))
-    reap_finished_processes()
-    return render_template("monitor.html", running_processes=RUNNING_PROCESSES, finished_log=FINISHED_LOG)
+    dispatch_queued_tasks()
+    return render_template("monitor.html", running_processes=RUNNING_PROCESSES, queued_tasks=QUEUED_TASKS,
+                           finished_log=FINISHED_LOG)
+
+@app.route("/cancel_queued/<task_name>")
+def cancel_queued(task_name):
+    if not session.get("logged_in"): return redirect(url_for("login"))
+    with PROCESS_LOCK:
+        if QUEUED_TASKS.pop(task_name, None):
+            flash(f"Removed '{task_name}' from the queue.", "info")
+        else:
+            flash(f"Task '{task_name}' is not queued.", "info")
+    return redirect(url_for("monitor"))
 
 @app.route("/stop_task/<task_name>")
 def stop_task(task_name):
@@ -1139,8 +1247,22 @@ def upload_select(category):
     
     if source_dir and os.path.exists(source_dir):
         files = sorted([f for f in os.listdir(source_dir) if f.lower().endswith(('.mp4', '.mov', '.mkv'))])
-        
-    return render_template("upload_select.html", category=category, files=files, source_dir=source_dir)
+
+    # Flag videos that look like something already uploaded (any category), before spending quota on them.
+    # Only stored fingerprints are read here; the "Check Duplicate Uploads" task computes new ones.
+    duplicates, pending = {}, []
+    if files:
+        try:
+            found, pending = video_fingerprint.read_likely_duplicates(controller_data, category, CONTROLLER_FILE)
+            for filename, matches in found.items():
+                path, match_category, distance = matches[0]
+                duplicates[filename] = {"name": os.path.basename(path), "category": match_category,
+                                        "similarity": round((1 - distance) * 100), "more": len(matches) - 1}
+        except Exception as e:
+            print(f"[Warn] Duplicate check failed: {e}", flush=True)
+
+    return render_template("upload_select.html", category=category, files=files, source_dir=source_dir,
+                           duplicates=duplicates, pending=[f for f in pending if f in files])
 
 @app.route("/upload_review/<category>/<filename>")
 def upload_review(category, filename):
@@ -1156,6 +1278,13 @@ def upload_review(category, filename):
     meta_entry = controller_data.get("json_data", {}).get(category, {}).get(base_name)
     video_name = meta_entry.get("name") if isinstance(meta_entry, dict) else None
     video_url = meta_entry.get("url") if isinstance(meta_entry, dict) else (meta_entry if isinstance(meta_entry, str) else None)
+
+    # Otherwise use the caption/owner cached by the downloader
+    post_meta = None
+    if not video_name:
+        post_meta = download_index.read_post_meta_for_file(cat_config.get("download_target_dir") or "", filename)
+        if post_meta:
+            video_name = upload_to_youtube.get_title_from_caption(post_meta.get("caption"))
     
     # Default Fallbacks
     default_title = cat_config.get("yt_default_title", "")
@@ -1167,9 +1296,11 @@ def upload_review(category, filename):
     final_desc = default_desc
     
     if video_name: 
-        final_title = f"{video_name.title()} #shorts"
+        final_title = f"{video_name if post_meta else video_name.title()} #shorts"
     if video_url:
         final_desc += f"\n\nSource: {video_url}"
+    if post_meta and post_meta.get("owner"):
+        final_desc += f"\nCredit: @{post_meta['owner']}"
         
     # Schedule Estimate (Tomorrow 10 AM)
     now = datetime.datetime.now()
@@ -1194,7 +1325,7 @@ def upload_execute():
     
     # Call the helper function in the script
     success, message = upload_to_youtube.upload_single_video_from_flask(
-        category, filename, request.form, CONTROLLER_FILE
+        category, filename, request.form, CONTROLLER_FILE, count_running_heavy()
     )
     
     if success:
@@ -0,0 +1,180 @@
+import sys
+# FORCE UTF-8 ENCODING FOR WINDOWS CONSOLE
+try:
+    sys.stdout.reconfigure(encoding='utf-8')
+except AttributeError:
+    pass
+
+import os
+import csv
+import time
+import datetime
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Shares the downloader, session handling and throttle of the category pipeline
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, os.path.join(PROJECT_DIR, "scripts"))
+import download_reels
+import download_index
+import instagram_throttle
+
+# --- Constants ---
+DEFAULT_LINKS_FILE = os.path.join(SCRIPT_DIR, "links.txt")
+DEFAULT_LOG_FILE = os.path.join(SCRIPT_DIR, "download_log.csv")
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_DIR, "data", "downloaded_videos", "insta_bulk")
+DEFAULT_WORKERS = 4
+# Links read ahead of the workers; keeps memory flat however long links.txt is
+QUEUE_FACTOR = 2
+LOG_COLUMNS = ["timestamp", "shortcode", "attempt", "status", "bytes", "elapsed_ms", "mb_per_s", "error"]
+
+# --- Helper Functions ---
+
+def iter_links(links_file):
+    """Yields (shortcode, url) per line of links.txt, one line at a time. Blank and # lines are skipped."""
+    with open(links_file, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if "/" not in line:
+                # A bare shortcode
+                line = f"https://www.instagram.com/reel/{line}/"
+            shortcode = download_reels.get_shortcode_from_url(line)
+            if not shortcode:
+                print(f"[WARN] Line {line_number}: not a post link: {line}", flush=True)
+                continue
+            yield shortcode, line
+
+class DownloadLog:
+    """
+    Appends one CSV row per download attempt (thread-safe, flushed per row).
+    A log written with different columns is moved aside to <log>.old first.
+    """
+
+    def __init__(self, log_file):
+        self._lock = threading.Lock()
+        if os.path.exists(log_file) and os.path.getsize(log_file) > 0:
+            with open(log_file, "r", encoding="utf-8", newline="") as f:
+                header = next(csv.reader(f), None)
+            if header != LOG_COLUMNS:
+                os.replace(log_file, log_file + ".old")
+                print(f"[Info] {os.path.basename(log_file)} had an older format; moved to {os.path.basename(log_file)}.old", flush=True)
+        self._file = open(log_file, "a", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        if self._file.tell() == 0:
+            self._writer.writerow(LOG_COLUMNS)
+            self._file.flush()
+
+    def write(self, shortcode, attempt, status, size, elapsed, error=None):
+        throughput = size / (1024 * 1024) / elapsed if size and elapsed > 0 else 0
+        with self._lock:
+            self._writer.writerow([datetime.datetime.now().isoformat(timespec="seconds"), shortcode, attempt,
+                                   status, size, round(elapsed * 1000), f"{throughput:.2f}", error or ""])
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+def main(links_file, output_dir, log_file, workers=DEFAULT_WORKERS, max_requests=None,
+         max_attempts=download_reels.DEFAULT_MAX_ATTEMPTS, direct_stream=True):
+    print(f"--- Bulk Download: {os.path.basename(links_file)} ---", flush=True)
+    if not os.path.exists(links_file):
+        print(f"[Error] File not found: {links_file}", flush=True)
+        return
+    if not download_reels.setup_folder(output_dir): return
+    output_dir = os.path.abspath(output_dir)
+    workers = max(1, workers)
+    max_requests = max(1, max_requests or download_reels.DEFAULT_MAX_CONCURRENT_REQUESTS)
+
+    # Index of what is already in the output folder (also journals failures for reruns)
+    index = download_index.DownloadIndex(download_index.get_index_path(output_dir))
+    index.journal_recover()
+    throttle = instagram_throttle.AdaptiveThrottle(
+        instagram_throttle.get_state_path(os.path.join(PROJECT_DIR, "controller", "controller.json")))
+    log = DownloadLog(log_file)
+
+    session_file = download_reels.find_session_file(SCRIPT_DIR) or download_reels.find_session_file()
+    if session_file:
+        print(f"[Auth] Found session file: {os.path.basename(session_file)}", flush=True)
+    else:
+        print("[Warn] No session file found. Running anonymously.", flush=True)
+
+    request_slots = threading.BoundedSemaphore(max_requests)
+    name_lock = threading.Lock()
+    thread_state = threading.local()
+    counts = {download_index.JOURNAL_DONE: 0, download_index.JOURNAL_FAILED: 0,
+              download_index.JOURNAL_NOT_VIDEO: 0, "skipped": 0}
+    counts_lock = threading.Lock()
+
+    def worker(shortcode, url):
+        if not hasattr(thread_state, "loader"):
+            thread_state.loader = download_reels.make_loader(session_file, quiet=True)
+            thread_state.http_session = download_reels.make_http_session() if direct_stream else None
+        attempts = []
+
+        def log_attempt(attempt, status, error, elapsed):
+            filename = index.get_filename(shortcode) if status == download_index.JOURNAL_DONE else None
+            size = os.path.getsize(os.path.join(output_dir, filename)) if filename else 0
+            log.write(shortcode, attempt, status, size, elapsed, error)
+            attempts.append(status)
+
+        started = time.perf_counter()
+        try:
+            download_reels.download_and_rename_media(url, shortcode, thread_state.loader, output_dir,
+                                                     request_slots=request_slots, name_lock=name_lock, index=index,
+                                                     http_session=thread_state.http_session,
+                                                     max_attempts=max_attempts, throttle=throttle,
+                                                     on_attempt=log_attempt)
+        except Exception as e:
+            print(f"[Error] Worker crashed for {shortcode}: {e}", flush=True)
+            log_attempt(len(attempts) + 1, download_index.JOURNAL_FAILED, f"{type(e).__name__}: {e}",
+                        time.perf_counter() - started)
+        status = attempts[-1] if attempts else download_index.JOURNAL_FAILED
+        with counts_lock:
+            counts[status] = counts.get(status, 0) + 1
+
+    # --- STREAM LINKS THROUGH A BOUNDED POOL ---
+    # At most workers * QUEUE_FACTOR links are queued; reading pauses until a slot frees up
+    queue_slots = threading.BoundedSemaphore(workers * QUEUE_FACTOR)
+    seen = set()
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for shortcode, url in iter_links(links_file):
+                if shortcode in seen or index.has_shortcode(shortcode):
+                    counts["skipped"] += 1
+                    continue
+                journal = index.journal_status(shortcode)
+                if journal and journal[0] == download_index.JOURNAL_NOT_VIDEO:
+                    counts["skipped"] += 1
+                    continue
+                seen.add(shortcode)
+                queue_slots.acquire()
+                executor.submit(worker, shortcode, url).add_done_callback(lambda future: queue_slots.release())
+    finally:
+        throttle.save()
+        log.close()
+        index.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"\n--- Finished in {elapsed:.0f}s. Downloaded: {counts[download_index.JOURNAL_DONE]}, "
+          f"Failed: {counts[download_index.JOURNAL_FAILED]}, Not video: {counts[download_index.JOURNAL_NOT_VIDEO]}, "
+          f"Skipped: {counts['skipped']} (log: {os.path.basename(log_file)}) ---", flush=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Downloads every reel listed in links.txt (one link or shortcode per line).")
+    parser.add_argument("--links", default=DEFAULT_LINKS_FILE)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--log", default=DEFAULT_LOG_FILE, help="CSV throughput log (one row per download attempt).")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--max-requests", type=int, default=None, help="Concurrent Instagram requests (default 3).")
+    parser.add_argument("--max-attempts", type=int, default=download_reels.DEFAULT_MAX_ATTEMPTS)
+    parser.add_argument("--no-direct-stream", action="store_true", help="Always download through Instaloader's temp folder.")
+    args = parser.parse_args()
+
+    main(os.path.abspath(args.links), os.path.abspath(args.output), os.path.abspath(args.log),
+         args.workers, args.max_requests, args.max_attempts, not args.no_direct_stream)
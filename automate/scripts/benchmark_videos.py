@@ -0,0 +1,399 @@
+import sys
+# sys.stdout.reconfigure(encoding='utf-8') # Uncomment if needed
+
+import os
+import json
+import time
+import hashlib
+import shutil
+import argparse
+import datetime
+import platform
+import itertools
+import statistics
+import subprocess
+
+try:
+    import resource # Unix only: CPU time and peak RSS of the ffmpeg children
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+if __name__ == "__main__":
+    import create_videos
+else:
+    from scripts import create_videos
+
+# --- Constants ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SCRIPT_DIR)
+DEFAULT_WORK_DIR = os.path.join(BASE_DIR, "data", "benchmarks")
+# Bump when the synthetic inputs or the measurement change (results are only comparable within a version)
+BENCHMARK_VERSION = 1
+# Synthetic inputs: fixed lavfi sources, so every run renders exactly the same pictures and sounds
+IMAGE_SOURCES = ["testsrc2", "smptehdbars", "mandelbrot"]
+IMAGE_SIZE = "720x1280"
+AUDIO_FREQUENCIES = [220, 440, 880]
+AUDIO_SECONDS = 20
+# Quote lengths from one-liner to paragraph so wrapping/layout cost shows up
+SYNTHETIC_QUOTES = [
+    ("Begin.", "Short"),
+    ("The way to get started is to quit talking and begin doing.", "Medium"),
+    ("Success is not final, failure is not fatal: it is the courage to continue that counts. "
+     "Keep going when it is hard, because the hard days are the ones that build you into "
+     "someone who can carry the easy ones without noticing.", "Long"),
+]
+
+# --- Helper Functions ---
+
+def run_quiet(command):
+    """Runs a command, raising CalledProcessError with stderr on failure."""
+    return subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8')
+
+def get_ffprobe_path(ffmpeg_path):
+    """Returns the ffprobe next to the given ffmpeg, or None."""
+    folder, name = os.path.split(ffmpeg_path)
+    candidate = os.path.join(folder, name.replace("ffmpeg", "ffprobe"))
+    return candidate if os.path.exists(candidate) else None
+
+def get_ffmpeg_version(ffmpeg_path):
+    try:
+        return run_quiet([ffmpeg_path, "-version"]).stdout.splitlines()[0]
+    except Exception:
+        return "unknown"
+
+def generate_inputs(ffmpeg_path, inputs_dir):
+    """
+    Creates the synthetic image/audio/quote set (once; reused by later runs).
+    Returns the path of the quotes JSON.
+    """
+    image_dir = os.path.join(inputs_dir, "images")
+    audio_dir = os.path.join(inputs_dir, "audio")
+    os.makedirs(image_dir, exist_ok=True)
+    os.makedirs(audio_dir, exist_ok=True)
+
+    quotes = {}
+    for i, (quote, author) in enumerate(SYNTHETIC_QUOTES):
+        base_name = f"{i+1:03d}"
+        quotes[base_name] = {"quote": quote, "comment": author}
+
+        image_file = os.path.join(image_dir, f"{base_name}.png")
+        if not os.path.exists(image_file):
+            source = IMAGE_SOURCES[i % len(IMAGE_SOURCES)]
+            run_quiet([ffmpeg_path, "-v", "error", "-f", "lavfi", "-i", f"{source}=size={IMAGE_SIZE}:rate=1",
+                       "-frames:v", "1", "-y", image_file])
+
+        audio_file = os.path.join(audio_dir, f"{base_name}.mp3")
+        if not os.path.exists(audio_file):
+            frequency = AUDIO_FREQUENCIES[i % len(AUDIO_FREQUENCIES)]
+            run_quiet([ffmpeg_path, "-v", "error", "-f", "lavfi",
+                       "-i", f"sine=frequency={frequency}:duration={AUDIO_SECONDS}",
+                       "-b:a", "128k", "-y", audio_file])
+
+    quotes_file = os.path.join(inputs_dir, "quotes.json")
+    with open(quotes_file, "w", encoding="utf-8") as f:
+        json.dump(quotes, f, indent=2)
+    return quotes_file
+
+def fingerprint_inputs(inputs_dir):
+    """Hash of the synthetic inputs, stored with results so comparisons can check they match."""
+    digest = hashlib.sha256()
+    for root, _, files in sorted(os.walk(inputs_dir)):
+        for name in sorted(files):
+            with open(os.path.join(root, name), "rb") as f:
+                digest.update(name.encode("utf-8"))
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def build_matrix(args):
+    """Expands the CLI setting lists into a list of configuration dicts."""
+    configs = []
+    for scale, preset, crf, fade, watermark, renderer, still in itertools.product(
+            args.scales, args.presets, args.crfs, args.fade_durations,
+            args.watermark, args.text_renderers, args.still_image):
+        configs.append({
+            "scale": "" if scale == "none" else scale,
+            "preset": preset,
+            "crf": crf,
+            "fade_duration": fade,
+            "watermark": watermark == "on",
+            "text_renderer": renderer,
+            "still_image": still == "on",
+        })
+    return configs
+
+def config_id(config):
+    """Stable, readable key for a configuration (used to match runs)."""
+    return (f"scale={config['scale'] or 'none'}|preset={config['preset']}|crf={config['crf']}|"
+            f"fade={config['fade_duration']:g}|wm={'on' if config['watermark'] else 'off'}|"
+            f"text={config['text_renderer']}|still={'on' if config['still_image'] else 'off'}")
+
+def build_render_args(config, run_spec):
+    """Builds a create_videos args namespace for one configuration."""
+    argv = [
+        "--input-json", run_spec["quotes_file"],
+        "--image-dir", run_spec["image_dir"],
+        "--audio-dir", run_spec["audio_dir"],
+        "--output-dir", run_spec["output_dir"],
+        "--ffmpeg-path", run_spec["ffmpeg_path"],
+        "--font-path", run_spec["font_path"],
+        "--include-author",
+        "--duration", str(run_spec["duration"]),
+        "--preset", config["preset"],
+        "--crf", str(config["crf"]),
+        "--fade-duration", str(config["fade_duration"]),
+        "--text-renderer", config["text_renderer"],
+    ]
+    if config["scale"]:
+        argv.extend(["--scale", config["scale"]])
+    if config["watermark"]:
+        argv.extend(["--watermark-text", "@benchmark"])
+    if config["still_image"]:
+        argv.append("--still-image")
+    return create_videos.build_arg_parser().parse_args(argv)
+
+def probe_bitrate(ffprobe_path, video_file, duration):
+    """Output bitrate in kbit/s (ffprobe if available, else size / duration)."""
+    if ffprobe_path:
+        try:
+            result = run_quiet([ffprobe_path, "-v", "error", "-show_entries", "format=bit_rate",
+                                "-of", "default=noprint_wrappers=1:nokey=1", video_file])
+            return round(int(result.stdout.strip()) / 1000, 1)
+        except Exception:
+            pass
+    return round(os.path.getsize(video_file) * 8 / duration / 1000, 1)
+
+# --- Worker (one configuration, one fresh process) ---
+
+def run_worker(spec_file):
+    """
+    Renders every synthetic quote with one configuration and prints a JSON result.
+    Runs in its own process so peak RSS of the ffmpeg children belongs to this config only.
+    """
+    with open(spec_file, "r", encoding="utf-8") as f:
+        run_spec = json.load(f)
+    config = run_spec["config"]
+    render_args = build_render_args(config, run_spec)
+    os.makedirs(render_args.output_dir, exist_ok=True)
+
+    # create_videos renders with the font copied into the working directory
+    os.chdir(SCRIPT_DIR)
+    if not create_videos.copy_font_locally(render_args.font_path):
+        print(json.dumps({"ok": False, "error": "font preparation failed"}))
+        return
+
+    with open(render_args.input_json, "r", encoding="utf-8") as f:
+        quotes = json.load(f)
+
+    ffprobe_path = get_ffprobe_path(render_args.ffmpeg_path)
+    usage_before = resource.getrusage(resource.RUSAGE_CHILDREN) if RESOURCE_AVAILABLE else None
+    self_before = resource.getrusage(resource.RUSAGE_SELF) if RESOURCE_AVAILABLE else None
+    wall_start = time.perf_counter()
+
+    ok = True
+    for base_name, data in quotes.items():
+        ok = create_videos.create_single_video(base_name, data["quote"], data.get("comment"), render_args) and ok
+
+    wall = time.perf_counter() - wall_start
+    result = {"ok": ok, "wall_s": round(wall, 3), "cpu_s": None, "peak_rss_mb": None}
+    if RESOURCE_AVAILABLE:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        cpu = (children.ru_utime - usage_before.ru_utime + children.ru_stime - usage_before.ru_stime
+               + own.ru_utime - self_before.ru_utime + own.ru_stime - self_before.ru_stime)
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        rss_divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+        result["cpu_s"] = round(cpu, 3)
+        result["peak_rss_mb"] = round(max(children.ru_maxrss, own.ru_maxrss) / rss_divisor, 1)
+
+    sizes, bitrates = [], []
+    if ok:
+        for base_name in quotes:
+            _, _, output_file = create_videos.get_input_paths(base_name, render_args)
+            sizes.append(os.path.getsize(output_file))
+            bitrates.append(probe_bitrate(ffprobe_path, output_file, render_args.duration))
+    result["output_bytes"] = sum(sizes)
+    result["bitrate_kbps"] = round(statistics.mean(bitrates), 1) if bitrates else None
+    print(json.dumps(result))
+
+# --- Benchmark Driver ---
+
+def run_config(config, run_spec_base, work_dir, repeat):
+    """Runs one configuration `repeat` times in worker processes; returns the aggregated row."""
+    spec_file = os.path.join(work_dir, "_current_config.json")
+    runs = []
+    for attempt in range(repeat):
+        run_spec = dict(run_spec_base, config=config)
+        with open(spec_file, "w", encoding="utf-8") as f:
+            json.dump(run_spec, f)
+        try:
+            completed = run_quiet([sys.executable, os.path.abspath(__file__), "--worker", spec_file])
+            runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        except subprocess.CalledProcessError as e:
+            runs.append({"ok": False, "error": e.stderr.strip()[-500:]})
+        except Exception as e:
+            runs.append({"ok": False, "error": str(e)})
+
+    good = [r for r in runs if r.get("ok")]
+    row = {"id": config_id(config), "config": config, "runs": len(runs), "ok": len(good) == len(runs)}
+    if not good:
+        row["error"] = runs[-1].get("error", "render failed")
+        return row
+
+    def median_of(key):
+        values = [r[key] for r in good if r.get(key) is not None]
+        return round(statistics.median(values), 3) if values else None
+
+    row.update({
+        "wall_s": median_of("wall_s"),
+        "cpu_s": median_of("cpu_s"),
+        "peak_rss_mb": max((r["peak_rss_mb"] for r in good if r.get("peak_rss_mb") is not None), default=None),
+        "bitrate_kbps": median_of("bitrate_kbps"),
+        "output_bytes": good[-1].get("output_bytes"),
+    })
+    return row
+
+def format_table(rows, baseline_rows=None):
+    """Plain-text results table, with % change against a baseline when given."""
+    headers = ["config", "wall s", "cpu s", "rss MB", "kbit/s", "bytes"]
+    if baseline_rows is not None:
+        headers.extend(["wall Δ", "size Δ"])
+
+    def delta(new, old):
+        if new is None or not old:
+            return "-"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    lines = []
+    for row in rows:
+        if not row.get("ok") and "wall_s" not in row:
+            cells = [row["id"], "FAILED", "", "", "", ""]
+            if baseline_rows is not None: cells.extend(["", ""])
+            lines.append(cells)
+            continue
+        cells = [row["id"]] + ["-" if row.get(k) is None else str(row[k])
+                               for k in ("wall_s", "cpu_s", "peak_rss_mb", "bitrate_kbps", "output_bytes")]
+        if baseline_rows is not None:
+            old = baseline_rows.get(row["id"], {})
+            cells.extend([delta(row.get("wall_s"), old.get("wall_s")),
+                          delta(row.get("output_bytes"), old.get("output_bytes"))])
+        lines.append(cells)
+
+    widths = [max(len(str(c)) for c in column) for column in zip(headers, *lines)]
+    out = ["  ".join(h.ljust(w) for h, w in zip(headers, widths)),
+           "  ".join("-" * w for w in widths)]
+    out.extend("  ".join(str(c).ljust(w) for c, w in zip(cells, widths)) for cells in lines)
+    return "\n".join(out)
+
+def main(args):
+    print("--- Starting Render Benchmark ---", flush=True)
+    ffmpeg_path = args.ffmpeg_path if os.path.exists(args.ffmpeg_path) else shutil.which(args.ffmpeg_path)
+    if not ffmpeg_path:
+        print(f"[Error] FFmpeg executable not found at: {args.ffmpeg_path}", flush=True)
+        return 1
+    args.ffmpeg_path = os.path.abspath(ffmpeg_path)
+
+    work_dir = os.path.abspath(args.work_dir)
+    inputs_dir = os.path.join(work_dir, "inputs")
+    try:
+        quotes_file = generate_inputs(args.ffmpeg_path, inputs_dir)
+    except subprocess.CalledProcessError as e:
+        print(f"[Error] Could not generate synthetic inputs: {e.stderr}", flush=True)
+        return 1
+
+    configs = build_matrix(args)
+    print(f"  > {len(configs)} configurations x {args.repeat} runs, {len(SYNTHETIC_QUOTES)} videos each.", flush=True)
+
+    run_spec_base = {
+        "quotes_file": quotes_file,
+        "image_dir": os.path.join(inputs_dir, "images"),
+        "audio_dir": os.path.join(inputs_dir, "audio"),
+        "output_dir": os.path.join(work_dir, "outputs"),
+        "ffmpeg_path": os.path.abspath(args.ffmpeg_path),
+        "font_path": args.font_path,
+        "duration": args.duration,
+    }
+
+    rows = []
+    for i, config in enumerate(configs, start=1):
+        print(f"  > [{i}/{len(configs)}] {config_id(config)}", flush=True)
+        row = run_config(config, run_spec_base, work_dir, args.repeat)
+        if not row["ok"]:
+            print(f"    [Warning] {row.get('error', 'some runs failed')}", flush=True)
+        rows.append(row)
+
+    results = {
+        "benchmark_version": BENCHMARK_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "ffmpeg": get_ffmpeg_version(args.ffmpeg_path),
+        },
+        "inputs": {"fingerprint": fingerprint_inputs(inputs_dir), "duration": args.duration,
+                   "videos_per_config": len(SYNTHETIC_QUOTES)},
+        "repeat": args.repeat,
+        "results": rows,
+    }
+
+    baseline_rows = None
+    if args.compare:
+        baseline = create_videos.load_json(args.compare)
+        if baseline:
+            if baseline.get("benchmark_version") != BENCHMARK_VERSION or \
+               baseline.get("inputs", {}).get("fingerprint") != results["inputs"]["fingerprint"]:
+                print("[Warning] Baseline was made with different benchmark inputs; deltas are not comparable.", flush=True)
+            if baseline.get("environment", {}).get("ffmpeg") != results["environment"]["ffmpeg"]:
+                print("[Warning] Baseline used a different FFmpeg build.", flush=True)
+            baseline_rows = {row["id"]: row for row in baseline.get("results", [])}
+
+    output_file = args.output or os.path.join(work_dir, f"render_bench_{datetime.datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print("\n" + format_table(rows, baseline_rows), flush=True)
+    print(f"\n[OK] Results saved to {output_file}", flush=True)
+
+    # Non-zero exit on regressions so it can gate a change
+    if baseline_rows:
+        regressions = [row["id"] for row in rows
+                       if row.get("wall_s") and baseline_rows.get(row["id"], {}).get("wall_s")
+                       and row["wall_s"] > baseline_rows[row["id"]]["wall_s"] * (1 + args.threshold / 100)]
+        if regressions:
+            print(f"[Warning] {len(regressions)} configurations slower than baseline by more than {args.threshold:g}%:", flush=True)
+            for rid in regressions:
+                print(f"  - {rid}", flush=True)
+            return 2
+    return 0
+
+# --- Command-Line Argument Parsing ---
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the quote video render pipeline on synthetic inputs.")
+    parser.add_argument("--worker", help=argparse.SUPPRESS) # Internal: run one configuration
+    parser.add_argument("--ffmpeg-path", default="ffmpeg", help="Path to the ffmpeg executable.")
+    parser.add_argument("--font-path", default=create_videos.DEFAULT_SYSTEM_FONT_PATH, help="TTF font used for rendering.")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help=f"Where inputs, outputs and results go (default: {DEFAULT_WORK_DIR}).")
+    parser.add_argument("--output", default="", help="Results JSON path (default: <work-dir>/render_bench_<timestamp>.json).")
+    parser.add_argument("--compare", default="", help="Previous results JSON to compare against.")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Wall-time regression threshold in percent for --compare (default: 10).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per configuration; the median is reported (default: 3).")
+    parser.add_argument("--duration", type=float, default=10, help="Length of each rendered video in seconds (default: 10).")
+
+    # --- Matrix ---
+    parser.add_argument("--scales", nargs="+", default=["none", "1080:1920"], help="Scale values ('none' = source size).")
+    parser.add_argument("--presets", nargs="+", default=["fast"], help="libx264 presets.")
+    parser.add_argument("--crfs", nargs="+", type=int, default=[23], help="CRF values.")
+    parser.add_argument("--fade-durations", nargs="+", type=float, default=[2.0], help="Fade-in durations.")
+    parser.add_argument("--watermark", nargs="+", choices=["on", "off"], default=["off", "on"], help="Watermark on/off.")
+    parser.add_argument("--text-renderers", nargs="+", choices=["drawtext", "overlay"], default=["drawtext", "overlay"], help="Text renderers.")
+    parser.add_argument("--still-image", nargs="+", choices=["on", "off"], default=["off", "on"], help="Still-image profile on/off.")
+
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker)
+        sys.exit(0)
+    sys.exit(main(args))
@@ -0,0 +1,272 @@
+import sys
+
+import os
+import json
+import sqlite3
+import hashlib
+import datetime
+import argparse
+import threading
+from pathlib import Path
+
+if __name__ == "__main__":
+    import download_index
+else:
+    try:
+        from scripts import download_index
+    except ImportError:
+        import download_index # Imported by a script run from this folder
+
+# --- Constants ---
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.webm', '.mpeg', '.mpg', '.3gp'}
+# Shared by all categories: <project>/data/content_registry.sqlite
+REGISTRY_FILE_NAME = "content_registry.sqlite"
+HASH_CHUNK_SIZE = 1024 * 1024
+# global_settings "duplicate_policy": what the downloader does with a reel another category already has
+DUPLICATE_POLICIES = ("skip", "link", "download")
+DEFAULT_DUPLICATE_POLICY = "skip"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS content (
+    path      TEXT PRIMARY KEY,
+    category  TEXT,
+    location  TEXT,
+    size      INTEGER NOT NULL,
+    mtime     REAL NOT NULL,
+    sha256    TEXT NOT NULL,
+    shortcode TEXT,
+    seen_at   TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_content_sha256 ON content(sha256);
+CREATE INDEX IF NOT EXISTS idx_content_shortcode ON content(shortcode);
+"""
+
+# --- Helper Functions ---
+
+def load_json(file_path):
+    if not os.path.exists(file_path):
+        print(f"[Error] File not found: {file_path}", flush=True)
+        return None
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[Error] Could not read file {file_path}: {e}", flush=True)
+        return None
+
+def get_registry_path(controller_path):
+    """Registry file for a controller.json (in the project's data folder)."""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(controller_path)))
+    return os.path.join(project_root, "data", REGISTRY_FILE_NAME)
+
+def get_duplicate_policy(settings):
+    policy = (settings or {}).get("duplicate_policy", DEFAULT_DUPLICATE_POLICY)
+    if policy not in DUPLICATE_POLICIES:
+        print(f"[Warn] Unknown duplicate_policy '{policy}', using '{DEFAULT_DUPLICATE_POLICY}'.", flush=True)
+        return DEFAULT_DUPLICATE_POLICY
+    return policy
+
+def hash_file(file_path):
+    """SHA-256 of a file, read in chunks (constant memory)."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_category_folders(controller_data):
+    """(category, location, folder) for every category's download and uploaded dirs."""
+    folders = []
+    for category, config in controller_data.get("categories", {}).items():
+        for location, key in (("download", "download_target_dir"), ("uploaded", "uploaded_dir")):
+            folder = config.get(key)
+            if folder:
+                folders.append((category, location, os.path.abspath(folder)))
+    return folders
+
+def read_index_shortcodes(folder):
+    """filename -> shortcode from a download folder's index, if it has one (never creates it)."""
+    index_path = download_index.get_index_path(folder)
+    if not os.path.exists(index_path):
+        return {}
+    try:
+        conn = sqlite3.connect(Path(index_path).as_uri() + "?mode=ro", uri=True)
+        try:
+            return dict(conn.execute("SELECT filename, shortcode FROM downloads WHERE shortcode IS NOT NULL"))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return {}
+
+def hard_link(source_path, target_path):
+    """Hard-links source to target. Returns False if the filesystem can't (e.g. another drive)."""
+    try:
+        os.link(source_path, target_path)
+        return True
+    except OSError:
+        return False
+
+# --- Registry ---
+
+class ContentRegistry:
+    """
+    Content-addressed record of every reel on disk across all categories:
+    path -> SHA-256 (plus size/mtime, so unchanged files are not re-hashed) and
+    shortcode. Thread-safe; several download runs can share the file (WAL).
+    """
+
+    def __init__(self, registry_path):
+        self.registry_path = registry_path
+        os.makedirs(os.path.dirname(os.path.abspath(registry_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(registry_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _existing(self, rows):
+        """Drops rows whose file is gone (the registry is only a cache of the folders)."""
+        alive = []
+        for row in rows:
+            if os.path.isfile(row[0]):
+                alive.append(row)
+            else:
+                with self._conn:
+                    self._conn.execute("DELETE FROM content WHERE path = ?", (row[0],))
+        return alive
+
+    # --- Lookups ---
+
+    def find_shortcode(self, shortcode, exclude_category=None):
+        """Files (path, category, location, sha256) holding this shortcode, outside `exclude_category`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, category, location, sha256 FROM content WHERE shortcode = ? AND category IS NOT ?",
+                (shortcode, exclude_category)).fetchall()
+            return self._existing(rows)
+
+    def find_hash(self, sha256, exclude_path=None):
+        """Files (path, category, location) with this content, other than `exclude_path`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, category, location FROM content WHERE sha256 = ? AND path != ?",
+                (sha256, os.path.abspath(exclude_path) if exclude_path else "")).fetchall()
+            return self._existing(rows)
+
+    def unregister(self, file_path):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM content WHERE path = ?", (os.path.abspath(file_path),))
+
+    def duplicate_groups(self):
+        """[(sha256, size, [(path, category, location, shortcode), ...]), ...] for content held more than once."""
+        with self._lock:
+            groups = self._conn.execute(
+                "SELECT sha256, MAX(size) FROM content GROUP BY sha256 HAVING COUNT(*) > 1 ORDER BY MAX(size) DESC").fetchall()
+            result = []
+            for sha256, size in groups:
+                files = self._conn.execute(
+                    "SELECT path, category, location, shortcode FROM content WHERE sha256 = ? ORDER BY category, path",
+                    (sha256,)).fetchall()
+                result.append((sha256, size, files))
+            return result
+
+    # --- Updates ---
+
+    def register(self, file_path, category=None, location=None, shortcode=None, sha256=None):
+        """Adds (or refreshes) a file; hashes it unless `sha256` is given. Returns the hash."""
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        sha256 = sha256 or hash_file(file_path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO content (path, category, location, size, mtime, sha256, shortcode, seen_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_path, category, location, stat.st_size, stat.st_mtime, sha256, shortcode,
+                 datetime.datetime.now().isoformat(timespec="seconds")))
+        return sha256
+
+    def scan(self, folders):
+        """
+        Brings the registry up to date with `folders` [(category, location, folder), ...]:
+        new or changed files are hashed, files that are gone are dropped.
+        Returns (files, hashed).
+        """
+        with self._lock:
+            known = {row[0]: row[1:] for row in
+                     self._conn.execute("SELECT path, size, mtime, shortcode FROM content")}
+        seen, hashed = set(), 0
+        for category, location, folder in folders:
+            if not os.path.isdir(folder):
+                continue
+            shortcodes = read_index_shortcodes(folder)
+            for entry in os.scandir(folder):
+                if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in VIDEO_EXTENSIONS:
+                    continue
+                path = os.path.abspath(entry.path)
+                seen.add(path)
+                stat = entry.stat()
+                shortcode = shortcodes.get(entry.name)
+                previous = known.get(path)
+                if previous and previous[0] == stat.st_size and previous[1] == stat.st_mtime:
+                    if shortcode and shortcode != previous[2]:
+                        with self._lock, self._conn:
+                            self._conn.execute("UPDATE content SET shortcode = ? WHERE path = ?", (shortcode, path))
+                    continue
+                try:
+                    self.register(path, category, location, shortcode or (previous[2] if previous else None))
+                    hashed += 1
+                except OSError as e:
+                    print(f"[Warn] Could not hash {entry.name}: {e}", flush=True)
+        # Forget files that left the scanned folders (moved to uploaded_dir are re-found there)
+        scanned = tuple(os.path.join(folder, "") for _, _, folder in folders)
+        stale = [path for path in known if path not in seen and path.startswith(scanned)]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM content WHERE path = ?", [(path,) for path in stale])
+        return len(seen), hashed
+
+# --- Report ---
+
+def print_duplicate_report(registry):
+    groups = registry.duplicate_groups()
+    if not groups:
+        print("[OK] No duplicate reels on disk.", flush=True)
+        return groups
+    wasted = 0
+    for sha256, size, files in groups:
+        # Hard links share their data, so only separate copies count as wasted space
+        inodes = {(os.stat(path).st_dev, os.stat(path).st_ino) for path, _, _, _ in files if os.path.exists(path)}
+        wasted += size * max(0, len(inodes) - 1)
+        print(f"\n[Dup] {sha256[:12]} ({size / (1024 * 1024):.1f} MB, {len(files)} copies)", flush=True)
+        for path, category, location, shortcode in files:
+            print(f"  > {category}/{location}: {os.path.basename(path)}" + (f" ({shortcode})" if shortcode else ""), flush=True)
+    print(f"\n[Info] {len(groups)} reels stored more than once, {wasted / (1024 * 1024):.1f} MB in extra copies.", flush=True)
+    return groups
+
+def main(controller_path):
+    controller_data = load_json(controller_path)
+    if not controller_data: return
+    registry = ContentRegistry(get_registry_path(controller_path))
+    try:
+        print("--- Scanning download and uploaded folders ---", flush=True)
+        files, hashed = registry.scan(get_category_folders(controller_data))
+        print(f"[Info] {files} files, {hashed} newly hashed.", flush=True)
+        print_duplicate_report(registry)
+    finally:
+        registry.close()
+
+if __name__ == "__main__":
+    # FORCE UTF-8 ENCODING FOR WINDOWS CONSOLE (only when run directly: the web controller imports this module)
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+    except AttributeError:
+        pass
+
+    parser = argparse.ArgumentParser(description="Lists reels stored more than once across all categories.")
+    parser.add_argument("--controller", default="../controller/controller.json")
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    main(os.path.abspath(os.path.join(script_dir, args.controller)))
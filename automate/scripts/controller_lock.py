@@ -0,0 +1,59 @@
+import os
+import json
+import stat
+import time
+import tempfile
+
+# --- Constants ---
+# Scripts that write controller.json take <controller>.lock while they re-read, merge and replace it
+LOCK_TIMEOUT = 60       # seconds to wait for another writer to finish
+LOCK_STALE_AFTER = 300  # a lock older than this was left by a crashed run
+
+class ControllerLock:
+    """Exclusive lock file next to controller.json, so concurrent writers never overwrite each other."""
+
+    def __init__(self, controller_path):
+        self.lock_path = controller_path + ".lock"
+
+    def __enter__(self):
+        deadline = time.time() + LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.lock_path) > LOCK_STALE_AFTER:
+                        os.remove(self.lock_path)
+                        continue
+                except OSError:
+                    continue # Released in the meantime
+                if time.time() > deadline:
+                    raise TimeoutError(f"{self.lock_path} is held by another run")
+                time.sleep(0.2)
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.lock_path)
+        except OSError:
+            pass
+
+def write_json_atomic(data, file_path):
+    """
+    Writes JSON to a uniquely named temp file in the same folder, then replaces
+    file_path with it: readers never see a half-written file, and two writers
+    never share a temp file. Raises OSError/TypeError on failure.
+    """
+    folder = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(file_path) + ".", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        if os.path.exists(file_path):
+            # mkstemp files are private (0600); keep the original's permissions
+            os.chmod(temp_path, stat.S_IMODE(os.stat(file_path).st_mode))
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try: os.remove(temp_path)
+        except OSError: pass
+        raise
@@ -5,16 +5,89 @@ import subprocess
 import os
 import shutil
 import json
+import re
+import math
+import hashlib
+import datetime
 import textwrap
 import argparse
+import threading
+import select
+import signal
+import ctypes
+import ctypes.util
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+if __name__ == "__main__":
+    import governor
+else:
+    try:
+        from scripts import governor
+    except ImportError:
+        import governor # Imported by a sibling script run from this folder
+
+try:
+    from PIL import Image, ImageDraw, ImageFont, ImageColor
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
 
 # --- Constants ---
 # Default font path (can be overridden by args)
 DEFAULT_SYSTEM_FONT_PATH = "C:/Windows/Fonts/arial.ttf"
 # Local filename to copy font to (avoids path issues)
 LOCAL_FONT_FILE = "_local_font.ttf"
-# Temporary filename for text content
-TEMP_TEXT_FILE = "_temp_text.txt"
+# Temporary filename pattern for per-job text content (kept relative, like the font)
+TEMP_TEXT_FILE = "_temp_text_{}.txt"
+# Per-job pre-rendered text/watermark layers for --text-renderer overlay
+TEMP_OVERLAY_FILE = "_temp_overlay_{}.png"
+TEMP_WATERMARK_FILE = "_temp_watermark_{}.png"
+# Per-job background scaled once for --still-image
+TEMP_BACKGROUND_FILE = "_temp_bg_{}.png"
+# Audio is transcoded once per distinct file into this cache (default: next to --audio-dir)
+AUDIO_CACHE_DIR_NAME = "audio_cache"
+AUDIO_BITRATE = "192k"
+AUDIO_PREPARE_LOCKS = {}
+# Probed audio length per file (seconds, None if unknown); total for the progress ETA
+AUDIO_DURATIONS = {}
+# Encodes running in this process (the governor admits extra ones; the first always starts)
+ENCODE_SLOTS = {"active": 0}
+ENCODE_SLOTS_LOCK = threading.Lock()
+GOVERNOR_POLL_SECONDS = 2
+AUDIO_PREPARE_LOCKS_GUARD = threading.Lock()
+# Still-image profile: seconds between keyframes (long GOP; the picture never changes)
+STILL_GOP_SECONDS = 10
+# Output profiles for --output-profiles: each is one extra encoder on the same composited
+# frames (split in one ffmpeg run). Default dir is <output-dir>/<name> unless 'dir' is ""
+# (the output dir itself); 'name=dir' on the command line overrides it.
+OUTPUT_PROFILES = {
+    "short":   {"suffix": "_video",   "dir": "", "filters": [], "crf": None, "maxrate": None, "audio_bitrate": None},
+    "square":  {"suffix": "_square",  "dir": None, "filters": ["crop='min(iw,ih)':'min(iw,ih)'", "scale=1080:1080"],
+                "crf": None, "maxrate": None, "audio_bitrate": None},
+    "preview": {"suffix": "_preview", "dir": None, "filters": ["scale=360:-2"],
+                "crf": 30, "maxrate": "400k", "audio_bitrate": "64k"},
+}
+# Live progress: seconds between [Progress] lines per video, stderr lines kept for error reports
+PROGRESS_PRINT_INTERVAL = 2.0
+FFMPEG_STDERR_TAIL = 60
+# Watch mode: inotify events that can mean an input appeared or changed
+# (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE)
+INOTIFY_WATCH_MASK = 0x002 | 0x004 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+WATCH_EVENT_COALESCE = 0.25
+# Render manifest (input fingerprint of every output), stored in the output dir by default
+RENDER_MANIFEST_FILE = "_render_manifest.json"
+# Bump when the render pipeline changes in a way that should invalidate old outputs
+RENDER_PIPELINE_VERSION = 2
+# Every arg that changes how the output looks (part of the fingerprint)
+FINGERPRINT_ARGS = (
+    "font_size", "font_color", "max_chars", "fade_duration", "include_author",
+    "watermark_text", "watermark_font_size", "watermark_color", "watermark_padding",
+    "scale", "duration", "text_renderer", "text_max_width",
+    "preset", "crf", "still_image", "fps", "still_input_fps", "still_hold",
+    "output_profiles",
+)
 
 # --- Helper Functions ---
 
@@ -50,64 +123,309 @@ def copy_font_locally(system_font_path):
         print(f" ERROR: Could not copy font: {e}", flush=True)
         return False
 
-def clean_up_temp_files():
-    """Removes temporary files created by the script."""
-    if os.path.exists(TEMP_TEXT_FILE):
-        try:
-            os.remove(TEMP_TEXT_FILE)
-            # print(f"  > Cleaned up temp file: {TEMP_TEXT_FILE}", flush=True)
-        except Exception as e:
-            print(f" Warning: Failed to remove temp text file: {e}", flush=True)
+def get_scratch_file(pattern, base_name):
+    """Returns a per-job scratch filename so parallel jobs never share files."""
+    safe_name = "".join(c if c.isalnum() else "_" for c in str(base_name))
+    # Names that only differ in replaced characters (e.g. "a?" and "a!") would otherwise collide
+    name_hash = hashlib.sha1(str(base_name).encode("utf-8")).hexdigest()[:8]
+    return pattern.format(f"{safe_name}_{name_hash}")
+
+def clean_up_temp_files(*temp_files):
+    """Removes the given per-job temporary files."""
+    for temp_file in temp_files:
+        if temp_file and os.path.exists(temp_file):
+            try:
+                os.remove(temp_file)
+                # print(f"  > Cleaned up temp file: {temp_file}", flush=True)
+            except Exception as e:
+                print(f" Warning: Failed to remove temp file {temp_file}: {e}", flush=True)
     # Don't remove the local font file as it might be needed again soon
 
-# --- Video Creation Logic ---
+def resolve_thread_budget(args):
+    """
+    Returns the libx264 thread count for each job.
+    0 lets ffmpeg decide (fine for a single job); with a pool the cores are split
+    between the workers so parallel encodes don't oversubscribe the machine.
+    """
+    if args.threads > 0:
+        return args.threads
+    if args.jobs <= 1:
+        return 0
+    return max(1, (os.cpu_count() or 1) // args.jobs)
+
+# --- Render Manifest ---
 
-def create_single_video(base_name, quote_text, author_text, args):
+def file_sha256(file_path, known=None):
     """
-    Creates a single video with quote, optional author, and watermark.
-    Uses arguments passed via `args` object.
+    Streams a file through SHA-256.
+    `known` is a previous {'size', 'mtime_ns', 'sha256'} record; if the file's
+    size and mtime still match, the stored hash is reused instead of re-reading.
+    Returns the new record.
     """
-    print(f"--- Processing '{base_name}' ---", flush=True)
+    stat = os.stat(file_path)
+    if known and known.get("size") == stat.st_size and known.get("mtime_ns") == stat.st_mtime_ns:
+        return known
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
 
-    # 1. Define paths
+def load_manifest(manifest_path):
+    """Loads the render manifest, returning an empty one if missing or invalid."""
+    manifest = {"version": RENDER_PIPELINE_VERSION, "entries": {}}
+    if not os.path.exists(manifest_path):
+        return manifest
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            loaded = json.load(f)
+        if loaded.get("version") == RENDER_PIPELINE_VERSION and isinstance(loaded.get("entries"), dict):
+            manifest = loaded
+        else:
+            print("  > Render manifest is from another pipeline version. Rebuilding all.", flush=True)
+    except Exception as e:
+        print(f" Warning: Could not read render manifest {manifest_path}: {e}", flush=True)
+    return manifest
+
+def save_manifest(manifest, manifest_path):
+    """Writes the manifest atomically (temp file + rename) so a stopped batch never corrupts it."""
+    temp_path = f"{manifest_path}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, manifest_path)
+        return True
+    except Exception as e:
+        print(f" Warning: Could not save render manifest: {e}", flush=True)
+        return False
+
+def get_quote_fields(data):
+    """Returns (quote_text, author_text) from a quotes JSON entry."""
+    if isinstance(data, dict):
+        return data.get('quote'), data.get('comment') # Author is optional
+    if isinstance(data, str): # Handle simpler JSON format if needed
+        return data, None # No author in this format
+    return None, None
+
+def get_input_paths(base_name, args):
+    """Returns (image_file, audio_file, output_file) for a base name."""
     image_file = os.path.join(args.image_dir, f"{base_name}.png") # Assuming PNG now
     audio_file = os.path.join(args.audio_dir, f"{base_name}.mp3")
     # Output filename includes _video to distinguish from source files
     output_file = os.path.join(args.output_dir, f"{base_name}_video.mp4")
+    return image_file, audio_file, output_file
 
-    # 2. Check inputs
-    if not os.path.exists(image_file):
-        print(f" SKIPPING: Cannot find image file: {image_file}", flush=True)
-        return False
-    if not os.path.exists(audio_file):
-        print(f" SKIPPING: Cannot find audio file: {audio_file}", flush=True)
+def resolve_output_profiles(args):
+    """
+    Turns --output-profiles ('name' or 'name=dir') into a list of profile dicts
+    with 'name' and resolved 'dir'. No profiles = the single classic output.
+    Raises ValueError for unknown profile names.
+    """
+    if not args.output_profiles:
+        return [dict(OUTPUT_PROFILES["short"], name="short", dir=args.output_dir)]
+
+    profiles = []
+    for spec in args.output_profiles:
+        name, _, custom_dir = spec.partition("=")
+        if name not in OUTPUT_PROFILES:
+            raise ValueError(f"Unknown output profile '{name}' (known: {', '.join(OUTPUT_PROFILES)})")
+        profile = dict(OUTPUT_PROFILES[name], name=name)
+        if custom_dir:
+            profile["dir"] = custom_dir
+        elif profile["dir"] is None:
+            profile["dir"] = os.path.join(args.output_dir, name)
+        else:
+            profile["dir"] = os.path.join(args.output_dir, profile["dir"]) if profile["dir"] else args.output_dir
+        profiles.append(profile)
+    return profiles
+
+def get_output_files(base_name, args):
+    """Returns [(profile, output_file)] for every output of one entry."""
+    return [(profile, os.path.join(profile["dir"], f"{base_name}{profile['suffix']}.mp4"))
+            for profile in resolve_output_profiles(args)]
+
+def compute_render_fingerprint(base_name, quote_text, author_text, args, previous_entry=None):
+    """
+    Fingerprints everything that goes into one output: image bytes, audio bytes,
+    font bytes, quote/comment text and all styling args.
+    Returns (fingerprint, input_records) or (None, None) if an input is missing.
+    """
+    image_file, audio_file, _ = get_input_paths(base_name, args)
+    if not os.path.exists(image_file) or not os.path.exists(audio_file):
+        return None, None
+
+    known_inputs = (previous_entry or {}).get("inputs", {})
+    inputs = {
+        "image": file_sha256(image_file, known_inputs.get("image")),
+        "audio": file_sha256(audio_file, known_inputs.get("audio")),
+    }
+    # Hash the font ffmpeg actually renders with (the local copy)
+    if os.path.exists(LOCAL_FONT_FILE):
+        inputs["font"] = file_sha256(LOCAL_FONT_FILE, known_inputs.get("font"))
+
+    payload = {
+        "pipeline": RENDER_PIPELINE_VERSION,
+        "inputs": {name: record["sha256"] for name, record in inputs.items()},
+        "quote": quote_text,
+        "comment": author_text,
+        "style": {name: getattr(args, name, None) for name in FINGERPRINT_ARGS},
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest(), inputs
+
+def record_render(manifest, manifest_path, base_name, entry, args):
+    """Stores a successful render's fingerprint and outputs in the manifest (saved right away)."""
+    output_files = [output_file for _, output_file in get_output_files(base_name, args)]
+    entry["output"] = os.path.basename(output_files[0])
+    if len(output_files) > 1:
+        entry["outputs"] = [os.path.relpath(f, args.output_dir) for f in output_files]
+    entry["rendered_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+    manifest["entries"][base_name] = entry
+    save_manifest(manifest, manifest_path)
+
+def is_render_up_to_date(base_name, fingerprint, manifest, args):
+    """True if the manifest has this exact fingerprint and every output is still on disk."""
+    entry = manifest["entries"].get(base_name)
+    if not entry or entry.get("fingerprint") != fingerprint:
         return False
+    return all(os.path.exists(output_file) for _, output_file in get_output_files(base_name, args))
+
+# --- Audio Preparation ---
+
+def get_audio_cache_dir(args):
+    """Returns the audio cache directory (--audio-cache-dir or <audio-dir>/../audio_cache)."""
+    if args.audio_cache_dir:
+        return args.audio_cache_dir
+    return os.path.join(os.path.dirname(os.path.abspath(args.audio_dir)), AUDIO_CACHE_DIR_NAME)
 
-    # 3. Prepare text content
+def get_prepared_audio_path(audio_sha256, args):
+    """Cache path for an audio file: keyed by content hash, bitrate and trim length."""
+    trim = f"_{args.duration:g}s" if args.duration > 0 else ""
+    return os.path.join(get_audio_cache_dir(args), f"{audio_sha256[:32]}_{AUDIO_BITRATE}{trim}.m4a")
+
+def prepare_audio_file(audio_file, prepared_path, args):
+    """Transcodes one audio file to AAC (trimmed to --duration) unless it is already cached."""
+    # One transcode per cache file even when watch-mode workers ask for the same track at once
+    with AUDIO_PREPARE_LOCKS_GUARD:
+        path_lock = AUDIO_PREPARE_LOCKS.setdefault(prepared_path, threading.Lock())
+    with path_lock:
+        return _prepare_audio_file_locked(audio_file, prepared_path, args)
+
+def _prepare_audio_file_locked(audio_file, prepared_path, args):
+    if os.path.exists(prepared_path):
+        return True
+    temp_path = f"{prepared_path}.{os.getpid()}.part.m4a"
+    command = [
+        args.ffmpeg_path, "-v", "error",
+        "-i", audio_file,
+        "-vn",
+        "-c:a", "aac",
+        "-b:a", AUDIO_BITRATE,
+    ]
+    if args.duration > 0:
+        command.extend(["-t", str(args.duration)])
+    command.extend(["-y", temp_path])
     try:
-        wrapped_lines = textwrap.wrap(quote_text, width=args.max_chars)
-        wrapped_quote = "\n".join(wrapped_lines)
+        subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8')
+        os.replace(temp_path, prepared_path) # Atomic: a half-written file never gets the cache name
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f" WARNING: Audio preparation failed for {os.path.basename(audio_file)}: {e.stderr.strip()}", flush=True)
+    except Exception as e:
+        print(f" WARNING: Audio preparation failed for {os.path.basename(audio_file)}: {e}", flush=True)
+    clean_up_temp_files(temp_path)
+    return False
 
-        final_text = wrapped_quote
-        if args.include_author and author_text:
-            final_text += f"\n\n— {author_text}" # Add author if requested and available
+def probe_audio_duration(audio_file, args):
+    """Length of an audio file in seconds from ffmpeg's header read (cached), or None."""
+    try:
+        stat = os.stat(audio_file)
+    except OSError:
+        return None
+    key = (audio_file, stat.st_size, stat.st_mtime_ns) # Watch mode may replace a file in place
+    if key in AUDIO_DURATIONS:
+        return AUDIO_DURATIONS[key]
+    duration = None
+    try:
+        result = subprocess.run([args.ffmpeg_path, "-hide_banner", "-i", audio_file],
+                                capture_output=True, text=True, encoding='utf-8', errors='replace')
+        match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+        if match:
+            duration = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + float(match.group(3))
+    except Exception:
+        pass
+    AUDIO_DURATIONS[key] = duration
+    return duration
 
-        with open(TEMP_TEXT_FILE, 'w', encoding='utf-8') as f:
-            f.write(final_text)
+def prepare_audio_batch(render_jobs, args, known_hashes=None):
+    """
+    Transcodes each distinct audio file (by content hash) to AAC once, in parallel,
+    and probes its duration (cached for the progress ETA).
+    `known_hashes` maps base_name -> audio sha256 already computed for the manifest.
+    Returns {base_name: prepared_path}; entries that failed fall back to in-encode audio.
+    """
+    known_hashes = known_hashes or {}
+    try:
+        os.makedirs(get_audio_cache_dir(args), exist_ok=True)
     except Exception as e:
-        print(f" ERROR: Failed to write temp text file: {e}", flush=True)
-        return False
+        print(f" WARNING: Could not create audio cache dir ({e}). Encoding audio inline.", flush=True)
+        return {}
 
-    # 4. Build FFmpeg filters
-    filters = []
+    targets = {} # prepared_path -> source audio file
+    prepared = {}
+    for base_name, _, _ in render_jobs:
+        _, audio_file, _ = get_input_paths(base_name, args)
+        if not os.path.exists(audio_file):
+            continue
+        try:
+            audio_sha256 = known_hashes.get(base_name) or file_sha256(audio_file)["sha256"]
+        except Exception as e:
+            print(f" WARNING: Could not hash audio for {base_name}: {e}", flush=True)
+            continue
+        prepared_path = get_prepared_audio_path(audio_sha256, args)
+        targets.setdefault(prepared_path, audio_file)
+        prepared[base_name] = prepared_path
 
-    # Optional scaling filter
-    if args.scale:
-        filters.append(f"scale={args.scale}")
+    to_build = {path: src for path, src in targets.items() if not os.path.exists(path)}
+    print(f"  > Audio: {len(targets)} distinct tracks for {len(prepared)} videos, "
+          f"{len(to_build)} to transcode, {len(targets) - len(to_build)} cached.", flush=True)
+
+    def prepare_and_probe(path, src):
+        ok = path not in to_build or prepare_audio_file(src, path, args)
+        if ok:
+            probe_audio_duration(path, args)
+        return ok
+
+    failed = set()
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = {executor.submit(prepare_and_probe, path, src): path for path, src in targets.items()}
+        for future in as_completed(futures):
+            if not future.result():
+                failed.add(futures[future])
+
+    return {base_name: path for base_name, path in prepared.items() if path not in failed}
+
+# --- Text Rendering ---
+
+def write_text_file(base_name, quote_text, author_text, args):
+    """Writes the wrapped quote (+ author) for drawtext. Returns the scratch filename."""
+    temp_text_file = get_scratch_file(TEMP_TEXT_FILE, base_name)
+    wrapped_lines = textwrap.wrap(quote_text, width=args.max_chars)
+    final_text = "\n".join(wrapped_lines)
+    if args.include_author and author_text:
+        final_text += f"\n\n— {author_text}" # Add author if requested and available
+
+    with open(temp_text_file, 'w', encoding='utf-8') as f:
+        f.write(final_text)
+    return temp_text_file
+
+def build_drawtext_filters(temp_text_file, args):
+    """Returns the drawtext filters (quote with fade-in, optional watermark) as a list."""
+    filters = []
 
     # Main text filter
     main_text_filter = (
-        f"drawtext=textfile='{TEMP_TEXT_FILE}':"
+        f"drawtext=textfile='{temp_text_file}':"
         f"fontfile='{LOCAL_FONT_FILE}':"
         f"fontsize={args.font_size}:"
         f"fontcolor={args.font_color}:"
@@ -131,48 +449,420 @@ def create_single_video(base_name, quote_text, author_text, args):
             f"y=h-text_h-{args.watermark_padding}"
         )
         filters.append(watermark_filter)
+    return filters
+
+def parse_color(color):
+    """Converts an FFmpeg color ('white', '#ffcc00', '0xffcc00', 'white@0.7') to an RGBA tuple."""
+    name, _, alpha = color.partition("@")
+    if name.lower().startswith("0x"):
+        name = "#" + name[2:]
+    r, g, b = ImageColor.getrgb(name)[:3]
+    opacity = float(alpha) if alpha else 1.0
+    return (r, g, b, int(round(max(0.0, min(1.0, opacity)) * 255)))
+
+def get_frame_size(image_file, args):
+    """Returns the output (width, height): the --scale target, or the image size."""
+    with Image.open(image_file) as img:
+        src_w, src_h = img.size
+    if not args.scale:
+        return src_w, src_h
+    w_str, _, h_str = args.scale.partition(":")
+    w, h = int(float(w_str)), int(float(h_str or -1))
+    # FFmpeg's -1/-2 keep the aspect ratio
+    if w <= 0 and h <= 0: return src_w, src_h
+    if w <= 0: w = round(src_w * h / src_h)
+    if h <= 0: h = round(src_h * w / src_w)
+    return w, h
+
+def wrap_text_to_width(text, font, max_width):
+    """Greedy word wrap measured in real font pixels."""
+    lines = []
+    current = ""
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if current and font.getlength(candidate) > max_width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return lines
+
+def render_text_layer(text, font, fill, output_path, align="center"):
+    """Draws text onto a transparent PNG cropped to the text's bounding box."""
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = measure.multiline_textbbox((0, 0), text, font=font, align=align)
+    left, top, right, bottom = math.floor(left), math.floor(top), math.ceil(right), math.ceil(bottom)
+    layer = Image.new("RGBA", (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+    ImageDraw.Draw(layer).multiline_text((-left, -top), text, font=font, fill=fill, align=align)
+    layer.save(output_path)
+    return output_path
 
-    # Join all filters with commas
-    final_filter_string = ",".join(filters)
+def render_text_overlays(base_name, quote_text, author_text, image_file, args):
+    """
+    Lays out the quote, author line and watermark once with Pillow.
+    Returns (text_png, watermark_png or None) as per-job scratch files.
+    """
+    frame_w, _ = get_frame_size(image_file, args)
+    font = ImageFont.truetype(LOCAL_FONT_FILE, args.font_size)
+    lines = wrap_text_to_width(quote_text, font, frame_w * args.text_max_width)
+    final_text = "\n".join(lines)
+    if args.include_author and author_text:
+        final_text += f"\n\n— {author_text}"
 
-    # 5. Build FFmpeg command
+    text_png = render_text_layer(final_text, font, parse_color(args.font_color),
+                                 get_scratch_file(TEMP_OVERLAY_FILE, base_name))
+
+    watermark_png = None
+    if args.watermark_text:
+        watermark_font = ImageFont.truetype(LOCAL_FONT_FILE, args.watermark_font_size)
+        watermark_png = render_text_layer(args.watermark_text, watermark_font, parse_color(args.watermark_color),
+                                          get_scratch_file(TEMP_WATERMARK_FILE, base_name))
+    return text_png, watermark_png
+
+def prescale_background(image_file, base_name, args):
+    """Scales the background image once into a per-job PNG (still-image profile)."""
+    scaled_file = get_scratch_file(TEMP_BACKGROUND_FILE, base_name)
     command = [
-        args.ffmpeg_path,
-        "-loop", "1",           # Loop the input image
+        args.ffmpeg_path, "-v", "error",
         "-i", image_file,
-        "-i", audio_file,
-        "-vf", final_filter_string, # Apply the combined filters
+        "-vf", f"scale={args.scale}",
+        "-frames:v", "1",
+        "-y", scaled_file,
+    ]
+    subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8')
+    return scaled_file
+
+def build_background_filters(args, prescaled, clip_duration=None):
+    """
+    Filters applied to the background input before any text. `clip_duration` is
+    the output length (--duration or the probed audio), if known.
+    """
+    filters = []
+    # Optional scaling filter (skipped when the still-image profile already scaled it)
+    if args.scale and not prescaled:
+        filters.append(f"scale={args.scale}")
+    # Still-image profile: the image is read at a low rate and put on the --fps grid.
+    # Every frame is kept while the text fades in; after that nothing changes, so only
+    # one frame per --still-hold seconds is kept (VFR) instead of encoding duplicates.
+    if args.still_image:
+        filters.append(f"fps={args.fps}")
+        fade_end = max(args.fade_duration, 0) + 1.0 / args.fps
+        hold_frames = max(1, int(round(args.fps * args.still_hold)))
+        keep = f"lt(t\\,{fade_end})+not(mod(n\\,{hold_frames}))"
+        if clip_duration:
+            # Also keep the last frame so the video track runs the whole clip
+            keep += f"+gte(t\\,{clip_duration - 1.0 / args.fps})"
+        filters.append(f"select='{keep}'")
+    return filters
+
+def build_overlay_filter_graph(args, has_watermark, background_filters):
+    """
+    Filter graph for pre-rendered layers. Input 2 is the text PNG, looped only
+    for the fade-in; input 3 the watermark PNG (one frame). After their last
+    frame, overlay repeats it, so the PNGs are decoded once instead of per frame.
+    """
+    parts = []
+    background = "[0:v]"
+    if background_filters:
+        parts.append(f"[0:v]{','.join(background_filters)}[bg]")
+        background = "[bg]"
+
+    text_chain = "[2:v]format=rgba"
+    if args.fade_duration > 0:
+        text_chain += f",fade=t=in:st=0:d={args.fade_duration}:alpha=1"
+    parts.append(f"{text_chain}[txt]")
+
+    text_out = "[vtxt]" if has_watermark else "[vout]"
+    parts.append(f"{background}[txt]overlay=x=(W-w)/2:y=(H-h)/2:eof_action=repeat{text_out}")
+    if has_watermark:
+        pad = args.watermark_padding
+        parts.append(f"[vtxt][3:v]overlay=x=W-w-{pad}:y=H-h-{pad}:eof_action=repeat[vout]")
+    return ";".join(parts)
+
+def build_output_split_graph(composite_graph, profiles):
+    """
+    Appends a split of [vout] to the composite graph, one branch per output
+    profile (with its crop/scale filters). Returns (graph, [output label, ...]).
+    """
+    labels = [f"[s{i}]" for i in range(len(profiles))]
+    parts = [composite_graph, f"[vout]split={len(profiles)}{''.join(labels)}"]
+    video_maps = []
+    for i, profile in enumerate(profiles):
+        if profile["filters"]:
+            parts.append(f"{labels[i]}{','.join(profile['filters'])}[o{i}]")
+            video_maps.append(f"[o{i}]")
+        else:
+            video_maps.append(labels[i])
+    return ";".join(parts), video_maps
+
+def build_encoder_args(profile, args, prepared_audio, clip_duration=None):
+    """Encoder options for one output (placed before its output file)."""
+    encoder_args = [
         "-c:v", "libx264",       # Video codec
-        "-preset", "fast",       # Encoding speed vs quality (faster encoding)
-        "-crf", "23",            # Constant Rate Factor (quality, lower is better, 18-28 is good range)
-        "-c:a", "aac",           # Audio codec
-        "-b:a", "192k",          # Audio bitrate
-        "-pix_fmt", "yuv420p",   # Pixel format for compatibility
-        "-y"                     # Overwrite output without asking
+        "-preset", args.preset,  # Encoding speed vs quality
+        "-crf", str(profile["crf"] or args.crf), # Constant Rate Factor (quality, lower is better, 18-28 is good range)
     ]
+    if profile["maxrate"]:
+        encoder_args.extend(["-maxrate", profile["maxrate"], "-bufsize", profile["maxrate"]])
+    if args.still_image:
+        encoder_args.extend([
+            "-tune", "stillimage",                       # x264 tuning for static content
+            "-g", str(int(args.fps * STILL_GOP_SECONDS)), # Long GOP
+            "-fps_mode", "vfr",                          # Keep the select'ed timestamps (on the --fps grid)
+        ])
+    if prepared_audio and not profile["audio_bitrate"]:
+        encoder_args.extend(["-c:a", "copy"])  # Already AAC (audio preparation stage)
+    else:
+        encoder_args.extend([
+            "-c:a", "aac",                                   # Audio codec
+            "-b:a", profile["audio_bitrate"] or AUDIO_BITRATE, # Audio bitrate
+        ])
+    encoder_args.extend(["-pix_fmt", "yuv420p"]) # Pixel format for compatibility
 
-    # Add duration option
-    if args.duration > 0:
-        command.extend(["-t", str(args.duration)]) # Use fixed duration
+    # Per-job CPU budget when running in a pool
+    thread_budget = resolve_thread_budget(args)
+    if thread_budget > 0:
+        encoder_args.extend(["-threads", str(thread_budget)])
+
+    # Add duration option (--duration, else the probed audio length)
+    if clip_duration:
+        encoder_args.extend(["-t", f"{clip_duration:g}"]) # Use fixed duration
+    else:
+        encoder_args.append("-shortest") # Audio length unknown: end with the shortest input
+    return encoder_args
+
+# --- FFmpeg Execution ---
+
+def format_seconds(seconds):
+    if seconds is None:
+        return "?"
+    seconds = int(round(seconds))
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+def parse_progress_seconds(block):
+    """Output position in seconds from a -progress block (None if not known yet)."""
+    for key in ("out_time_us", "out_time_ms"): # Both are microseconds
+        value = block.get(key, "N/A")
+        if value not in ("", "N/A"):
+            try:
+                return max(int(value), 0) / 1_000_000
+            except ValueError:
+                pass
+    return None
+
+def format_progress_line(base_name, block, position, total_duration):
+    """One [Progress] line: frame, fps, speed, position and ETA."""
+    speed_text = block.get("speed", "N/A").strip()
+    try:
+        speed = float(speed_text.rstrip("x"))
+    except ValueError:
+        speed = 0.0
+    eta = None
+    if total_duration and position is not None and speed > 0:
+        eta = max(total_duration - position, 0) / speed
+    total_text = f"/{format_seconds(total_duration)}" if total_duration else ""
+    return (f"[Progress] {base_name}: frame={block.get('frame', '0')} fps={block.get('fps', '0')} "
+            f"speed={speed_text} time={format_seconds(position)}{total_text} eta={format_seconds(eta)}")
+
+def acquire_encode_slot(base_name, args):
+    """
+    Blocks until another concurrent encode fits the host's load/memory
+    (resource governor). The first encode of this process always starts,
+    except in --watch mode, where the controller does not admit the task itself.
+    """
+    limits = governor.get_limits({
+        "governor_max_load_per_cpu": args.max_load_per_cpu,
+        "governor_min_free_memory_mb": args.min_free_memory_mb,
+    })
+    last_report = None
+    while True:
+        with ENCODE_SLOTS_LOCK:
+            if args.no_governor or (ENCODE_SLOTS["active"] == 0 and not args.watch):
+                admitted, reason = True, ""
+            else:
+                admitted, reason = governor.check_capacity("render", 0, limits)
+            if admitted:
+                ENCODE_SLOTS["active"] += 1
+                return
+        if last_report is None or time.monotonic() - last_report >= governor.REPORT_INTERVAL_SECONDS:
+            print(f"  > [Governor] {base_name} waiting: {reason}", flush=True)
+            last_report = time.monotonic()
+        time.sleep(GOVERNOR_POLL_SECONDS)
+
+def release_encode_slot():
+    with ENCODE_SLOTS_LOCK:
+        ENCODE_SLOTS["active"] -= 1
+
+def run_ffmpeg(command, base_name, args, total_duration=None):
+    """
+    Runs an FFmpeg command with -progress on stdout and prints [Progress] lines
+    as it encodes. Kills the process if its output position stops advancing for
+    --stall-timeout seconds.
+    Returns (return_code, stderr_tail, stalled).
+    """
+    command = [command[0], "-progress", "pipe:1", "-nostats"] + command[1:]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, encoding='utf-8', errors='replace')
+
+    # Drain stderr in the background so a chatty FFmpeg can't fill the pipe and block
+    stderr_tail = deque(maxlen=FFMPEG_STDERR_TAIL)
+    def drain_stderr():
+        for line in process.stderr:
+            stderr_tail.append(line.rstrip())
+    stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
+    stderr_thread.start()
+
+    # Watchdog: last time the output position moved forward
+    state = {"last_advance": time.monotonic(), "position": -1.0, "stalled": False}
+    finished = threading.Event()
+    def watchdog():
+        while not finished.wait(1.0):
+            if time.monotonic() - state["last_advance"] > args.stall_timeout:
+                state["stalled"] = True
+                process.kill()
+                return
+    if args.stall_timeout > 0:
+        threading.Thread(target=watchdog, daemon=True).start()
+
+    block = {}
+    last_print = 0.0
+    try:
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+            if not key:
+                continue
+            block[key] = value
+            if key != "progress": # 'progress' ends each block
+                continue
+
+            position = parse_progress_seconds(block)
+            if position is not None and position > state["position"]:
+                state["position"] = position
+                state["last_advance"] = time.monotonic()
+
+            now = time.monotonic()
+            if value == "end" or now - last_print >= PROGRESS_PRINT_INTERVAL:
+                print(format_progress_line(base_name, block, position, total_duration), flush=True)
+                last_print = now
+            block = {}
+        process.wait()
+    finally:
+        finished.set()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        stderr_thread.join(timeout=5)
+    return process.returncode, "\n".join(stderr_tail), state["stalled"]
+
+# --- Video Creation Logic ---
+
+def create_single_video(base_name, quote_text, author_text, args, prepared_audio=None):
+    """
+    Creates a single video with quote, optional author, and watermark.
+    Uses arguments passed via `args` object.
+    `prepared_audio` is an already-transcoded AAC file to stream-copy.
+    """
+    print(f"--- Processing '{base_name}' ---", flush=True)
+
+    # 1. Define paths
+    image_file, audio_file, _ = get_input_paths(base_name, args)
+    output_files = get_output_files(base_name, args)
+
+    # 2. Check inputs
+    if not os.path.exists(image_file):
+        print(f" SKIPPING: Cannot find image file: {image_file}", flush=True)
+        return False
+    if not os.path.exists(audio_file):
+        print(f" SKIPPING: Cannot find audio file: {audio_file}", flush=True)
+        return False
+
+    # 3. Prepare background and text content (per-job scratch files)
+    temp_files = []
+    background_file = image_file
+    try:
+        if args.still_image and args.scale:
+            background_file = prescale_background(image_file, base_name, args)
+            temp_files.append(background_file)
+
+        if args.text_renderer == "overlay":
+            text_png, watermark_png = render_text_overlays(base_name, quote_text, author_text, image_file, args)
+            temp_files.extend([text_png, watermark_png])
+        else:
+            temp_text_file = write_text_file(base_name, quote_text, author_text, args)
+            temp_files.append(temp_text_file)
+    except Exception as e:
+        print(f" ERROR: Failed to prepare background/text for {base_name}: {e}", flush=True)
+        clean_up_temp_files(*temp_files)
+        return False
+
+    # 4. Build FFmpeg inputs and filters
+    # Explicit length: -shortest cuts the sparse still-image (VFR) video track short
+    clip_duration = args.duration or probe_audio_duration(prepared_audio or audio_file, args)
+    input_args = ["-loop", "1"]     # Loop the input image
+    if args.still_image:
+        input_args.extend(["-framerate", str(args.still_input_fps)])
+    input_args.extend(["-i", background_file, "-i", prepared_audio or audio_file])
+    background_filters = build_background_filters(args, background_file != image_file, clip_duration)
+
+    if args.text_renderer == "overlay":
+        # Text layer only needs frames while it fades in; watermark is a single frame
+        if args.fade_duration > 0:
+            input_args.extend(["-loop", "1", "-t", str(args.fade_duration)])
+            if args.still_image:
+                input_args.extend(["-framerate", str(args.fps)]) # Smooth fade at the output rate
+        input_args.extend(["-i", text_png])
+        if watermark_png:
+            input_args.extend(["-i", watermark_png])
+        filter_graph = build_overlay_filter_graph(args, watermark_png is not None, background_filters)
+        video_filters = None
     else:
-        command.append("-shortest") # Use duration of shortest input (audio)
+        filter_graph = None
+        # Join all filters with commas
+        video_filters = ",".join(background_filters + build_drawtext_filters(temp_text_file, args))
 
-    command.append(output_file) # Add the output file path last
+    # 5. Build FFmpeg command (one output per profile, all fed from one composite)
+    output_profiles = [profile for profile, _ in output_files]
+    if len(output_files) == 1 and not output_profiles[0]["filters"]:
+        if filter_graph:
+            filter_args, video_maps = ["-filter_complex", filter_graph], ["[vout]"]
+        else:
+            filter_args, video_maps = ["-vf", video_filters], [None]
+    else:
+        filter_graph, video_maps = build_output_split_graph(
+            filter_graph or f"[0:v]{video_filters}[vout]", output_profiles)
+        filter_args = ["-filter_complex", filter_graph]
 
-    # 6. Run FFmpeg
+    command = [args.ffmpeg_path] + input_args + filter_args + ["-y"] # Overwrite outputs without asking
+    for (profile, output_file), video_map in zip(output_files, video_maps):
+        if video_map:
+            command.extend(["-map", video_map, "-map", "1:a"])
+        command.extend(build_encoder_args(profile, args, prepared_audio, clip_duration))
+        command.append(output_file)
+
+    # 6. Run FFmpeg (progress streamed live, stalled encodes killed)
     try:
-        print(f"  > Running FFmpeg for {base_name}...", flush=True)
-        # Using Popen to potentially capture output better if needed, but run waits
-        process = subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8')
-        print(f" Successfully created video: {output_file}", flush=True)
+        acquire_encode_slot(base_name, args)
+        try:
+            print(f"  > Running FFmpeg for {base_name}...", flush=True)
+            return_code, stderr_text, stalled = run_ffmpeg(command, base_name, args, clip_duration)
+        finally:
+            release_encode_slot()
+        if stalled:
+            print(f"\n ERROR: FFmpeg stalled for {base_name} (no progress for {args.stall_timeout:g}s); killed.", flush=True)
+            clean_up_temp_files(*(f for _, f in output_files)) # Partial outputs
+            return False
+        if return_code != 0:
+            print(f"\n ERROR: FFmpeg failed for {base_name}.", flush=True)
+            # Print FFmpeg's stderr for detailed error messages
+            print("--- FFmpeg Error Output ---", flush=True)
+            print(stderr_text, flush=True)
+            print("--- End FFmpeg Error ---", flush=True)
+            return False
+        for _, output_file in output_files:
+            print(f" Successfully created video: {output_file}", flush=True)
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"\n ERROR: FFmpeg failed for {base_name}.", flush=True)
-        # Print FFmpeg's stderr for detailed error messages
-        print("--- FFmpeg Error Output ---", flush=True)
-        print(e.stderr, flush=True)
-        print("--- End FFmpeg Error ---", flush=True)
-        return False
     except FileNotFoundError:
         print(f" ERROR: FFmpeg executable not found at '{args.ffmpeg_path}'. Check path.", flush=True)
         return False
@@ -180,8 +870,213 @@ def create_single_video(base_name, quote_text, author_text, args):
          print(f" An unexpected error occurred during FFmpeg execution: {e}", flush=True)
          return False
     finally:
-        # Clean up temp text file after each video
-        clean_up_temp_files()
+        # Clean up this job's scratch files
+        clean_up_temp_files(*temp_files)
+
+def render_batch(render_jobs, args, on_result=None, prepared_audio=None):
+    """
+    Renders a list of (base_name, quote_text, author_text) jobs.
+    Runs sequentially for --jobs 1, otherwise in a thread pool (each worker just
+    waits on its own ffmpeg process). `on_result(base_name, success)` is called
+    from the calling thread as each job finishes. `prepared_audio` maps
+    base_name -> cached AAC file from prepare_audio_batch.
+    Returns a list of (base_name, success).
+    """
+    prepared_audio = prepared_audio or {}
+    results = []
+    if args.jobs <= 1:
+        for i, (base_name, quote_text, author_text) in enumerate(render_jobs):
+            print(f"\n--- Starting Video {i+1} of {len(render_jobs)} ---", flush=True)
+            success = create_single_video(base_name, quote_text, author_text, args, prepared_audio.get(base_name))
+            results.append((base_name, success))
+            if on_result: on_result(base_name, success)
+        return results
+
+    print(f"\n  > Rendering {len(render_jobs)} videos with {args.jobs} workers "
+          f"({resolve_thread_budget(args)} encoder threads each)...", flush=True)
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {
+            executor.submit(create_single_video, base_name, quote_text, author_text, args,
+                            prepared_audio.get(base_name)): base_name
+            for base_name, quote_text, author_text in render_jobs
+        }
+        for done_count, future in enumerate(as_completed(futures), start=1):
+            base_name = futures[future]
+            try:
+                success = future.result()
+            except Exception as e:
+                print(f" ERROR: Worker crashed for {base_name}: {e}", flush=True)
+                success = False
+            results.append((base_name, success))
+            if on_result: on_result(base_name, success)
+            print(f"  > [{done_count}/{len(render_jobs)}] {base_name}: {'OK' if success else 'FAILED'}", flush=True)
+    return results
+
+# --- Watch Mode (render service) ---
+
+def open_inotify(paths):
+    """
+    Returns a non-blocking inotify fd watching the given directories (Linux),
+    or None if inotify isn't available (the caller falls back to polling).
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        for path in paths:
+            if libc.inotify_add_watch(fd, os.fsencode(path), INOTIFY_WATCH_MASK) < 0:
+                os.close(fd)
+                return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+def wait_for_changes(inotify_fd, timeout):
+    """Sleeps up to `timeout` seconds, returning early (True) on an inotify event."""
+    if inotify_fd is None:
+        time.sleep(timeout)
+        return False
+    readable, _, _ = select.select([inotify_fd], [], [], timeout)
+    if not readable:
+        return False
+    time.sleep(WATCH_EVENT_COALESCE) # Let a burst of events (e.g. a file copy) finish
+    try:
+        while os.read(inotify_fd, 65536): # Drain; the scan works out what changed
+            pass
+    except (BlockingIOError, OSError):
+        pass
+    return True
+
+def get_input_signature(base_name, quote_text, author_text, args):
+    """Cheap (stat-based) signature of one entry's inputs, or None if an input is missing."""
+    image_file, audio_file, _ = get_input_paths(base_name, args)
+    try:
+        image_stat, audio_stat = os.stat(image_file), os.stat(audio_file)
+    except OSError:
+        return None
+    return (image_stat.st_size, image_stat.st_mtime_ns, audio_stat.st_size, audio_stat.st_mtime_ns,
+            quote_text, author_text)
+
+def render_watched_entry(base_name, quote_text, author_text, args, entry):
+    """Worker for watch mode: prepares this entry's audio, then renders it."""
+    prepared_audio = {}
+    if not args.no_audio_cache:
+        known_hashes = {base_name: entry["inputs"]["audio"]["sha256"]} if entry else None
+        prepared_audio = prepare_audio_batch([(base_name, quote_text, author_text)], args, known_hashes)
+    return create_single_video(base_name, quote_text, author_text, args, prepared_audio.get(base_name))
+
+def _stop_watching(signum, frame):
+    raise KeyboardInterrupt # Stop Task in the controller sends SIGTERM
+
+def watch_and_render(args):
+    """
+    Long-running service: watches --image-dir, --audio-dir and --input-json and
+    renders an entry as soon as it has a quote, an image and an audio file whose
+    sizes/mtimes have been stable for --settle-seconds (so half-written uploads
+    are not picked up). Uses the render manifest, so unchanged entries are skipped.
+    """
+    manifest_path = args.manifest or os.path.join(args.output_dir, RENDER_MANIFEST_FILE)
+    manifest = load_manifest(manifest_path)
+    json_dir = os.path.dirname(os.path.abspath(args.input_json))
+    watch_dirs = list(dict.fromkeys(os.path.abspath(d) for d in (args.image_dir, args.audio_dir, json_dir)))
+    for watch_dir in watch_dirs:
+        os.makedirs(watch_dir, exist_ok=True)
+
+    signal.signal(signal.SIGTERM, _stop_watching)
+    inotify_fd = open_inotify(watch_dirs)
+    mode = "inotify" if inotify_fd is not None else f"polling every {args.watch_interval:g}s"
+    print(f"  > [Watch] Watching {', '.join(watch_dirs)} ({mode}). Press Ctrl+C to stop.", flush=True)
+
+    quotes_data = {}
+    quotes_stat = None
+    seen = {}        # base_name -> (signature, time it was first seen with that signature)
+    handled = {}     # base_name -> signature that was last rendered/skipped
+    in_flight = {}   # future -> (base_name, signature, manifest entry)
+
+    executor = ThreadPoolExecutor(max_workers=max(args.jobs, 1))
+    try:
+        while True:
+            # 1. Collect finished renders (manifest is only written from this thread)
+            for future in [f for f in in_flight if f.done()]:
+                base_name, signature, entry = in_flight.pop(future)
+                try:
+                    success = future.result()
+                except Exception as e:
+                    print(f" ERROR: Worker crashed for {base_name}: {e}", flush=True)
+                    success = False
+                if success and entry:
+                    record_render(manifest, manifest_path, base_name, entry, args)
+                handled[base_name] = signature # Failures wait for the inputs to change
+                print(f"  > [Watch] {base_name}: {'OK' if success else 'FAILED'}", flush=True)
+
+            # 2. Reload the quotes JSON when it changes (keep the last good copy if it's mid-write)
+            try:
+                current_stat = os.stat(args.input_json)
+                current_stat = (current_stat.st_size, current_stat.st_mtime_ns)
+            except OSError:
+                current_stat = None
+            if current_stat and current_stat != quotes_stat:
+                loaded = load_json(args.input_json)
+                quotes_stat = current_stat # Not retried until the file changes again
+                if isinstance(loaded, dict):
+                    quotes_data = loaded
+
+            # 3. Queue entries that are complete and settled
+            now = time.monotonic()
+            busy = {base_name for base_name, _, _ in in_flight.values()}
+            settling = False
+            for base_name, data in quotes_data.items():
+                quote_text, author_text = get_quote_fields(data)
+                if not quote_text or base_name in busy:
+                    continue
+                signature = get_input_signature(base_name, quote_text, author_text, args)
+                if signature is None or handled.get(base_name) == signature:
+                    continue
+                if seen.get(base_name, (None,))[0] != signature:
+                    seen[base_name] = (signature, now) # New or still changing
+                    settling = True
+                    continue
+                if now - seen[base_name][1] < args.settle_seconds:
+                    settling = True
+                    continue
+
+                try:
+                    fingerprint, inputs = compute_render_fingerprint(
+                        base_name, quote_text, author_text, args, manifest["entries"].get(base_name))
+                except Exception as e:
+                    print(f" WARNING for {base_name}: Could not fingerprint inputs ({e}). Rendering anyway.", flush=True)
+                    fingerprint, inputs = None, None
+                if fingerprint and not args.force and is_render_up_to_date(base_name, fingerprint, manifest, args):
+                    handled[base_name] = signature
+                    continue
+
+                entry = {"fingerprint": fingerprint, "inputs": inputs} if fingerprint else None
+                print(f"  > [Watch] Queued {base_name}", flush=True)
+                future = executor.submit(render_watched_entry, base_name, quote_text, author_text, args, entry)
+                in_flight[future] = (base_name, signature, entry)
+
+            # 4. Sleep until something changes (or the next settle/poll check)
+            timeout = min(args.watch_interval, args.settle_seconds / 2) if settling or in_flight else args.watch_interval
+            wait_for_changes(inotify_fd, max(timeout, 0.2))
+    except KeyboardInterrupt:
+        print("\n  > [Watch] Stopping; waiting for running renders to finish...", flush=True)
+    finally:
+        executor.shutdown(wait=True)
+        # Record renders that finished while stopping, so they are not redone next start
+        for future, (base_name, _, entry) in in_flight.items():
+            try:
+                success = not future.cancelled() and future.result()
+            except Exception as e:
+                print(f" ERROR: Worker crashed for {base_name}: {e}", flush=True)
+                success = False
+            if success and entry:
+                record_render(manifest, manifest_path, base_name, entry, args)
+            print(f"  > [Watch] {base_name}: {'OK' if success else 'FAILED'}", flush=True)
+        if inotify_fd is not None:
+            os.close(inotify_fd)
 
 # --- Main Execution ---
 
@@ -200,14 +1095,25 @@ def main(args):
         print("Aborting: Font file preparation failed.", flush=True)
         return
 
-    # 3. Ensure Output Directory Exists
+    # 3. Ensure Output Directories Exist (one per output profile)
     try:
-        os.makedirs(args.output_dir, exist_ok=True)
+        output_dirs = [args.output_dir] + [profile["dir"] for profile in resolve_output_profiles(args)]
+        for output_dir in dict.fromkeys(output_dirs):
+            os.makedirs(output_dir, exist_ok=True)
         print(f"  > Output directory ready: {args.output_dir}", flush=True)
+        if args.output_profiles:
+            print(f"  > Output profiles: {', '.join(args.output_profiles)}", flush=True)
+    except ValueError as e:
+        print(f" ERROR: {e}", flush=True)
+        return
     except Exception as e:
         print(f" ERROR: Could not create output directory: {e}", flush=True)
         return
 
+    if args.watch:
+        watch_and_render(args)
+        return
+
     # 4. Load Quotes JSON
     quotes_data = load_json(args.input_json)
     if not quotes_data:
@@ -215,45 +1121,78 @@ def main(args):
         return
     print(f"  > Loaded {len(quotes_data)} quote entries from {args.input_json}.", flush=True)
 
-    # 5. Process Each Quote
-    success_count = 0
+    # 5. Collect Render Jobs (skipping outputs whose inputs are unchanged)
+    manifest_path = args.manifest or os.path.join(args.output_dir, RENDER_MANIFEST_FILE)
+    manifest = load_manifest(manifest_path)
+    pending_entries = {}
+    render_jobs = []
     fail_count = 0
-    total_videos = len(quotes_data)
-
-    for i, (base_name, data) in enumerate(quotes_data.items()):
-        print(f"\n--- Starting Video {i+1} of {total_videos} ---", flush=True)
-
-        quote_text = None
-        author_text = None
+    skipped_count = 0
+    failed_names = []
 
-        if isinstance(data, dict):
-            quote_text = data.get('quote')
-            author_text = data.get('comment') # Get author if present
-        elif isinstance(data, str): # Handle simpler JSON format if needed
-             quote_text = data
-             # No author in this format
+    for base_name, data in quotes_data.items():
+        quote_text, author_text = get_quote_fields(data)
 
         if not quote_text:
             print(f" SKIPPING {base_name}: 'quote' field missing or empty in JSON data.", flush=True)
             fail_count += 1
+            failed_names.append(base_name)
             continue
 
         if args.include_author and not author_text:
              print(f" WARNING for {base_name}: --include-author specified, but 'comment' field missing.", flush=True)
 
-        if create_single_video(base_name, quote_text, author_text, args):
-             success_count += 1
+        try:
+            fingerprint, inputs = compute_render_fingerprint(
+                base_name, quote_text, author_text, args, manifest["entries"].get(base_name))
+        except Exception as e:
+            print(f" WARNING for {base_name}: Could not fingerprint inputs ({e}). Rendering anyway.", flush=True)
+            fingerprint, inputs = None, None
+
+        if fingerprint and not args.force and is_render_up_to_date(base_name, fingerprint, manifest, args):
+            print(f"  > [Skip] {base_name}: inputs unchanged since last render.", flush=True)
+            skipped_count += 1
+            continue
+
+        if fingerprint:
+            pending_entries[base_name] = {"fingerprint": fingerprint, "inputs": inputs}
+        render_jobs.append((base_name, quote_text, author_text))
+
+    print(f"  > {len(render_jobs)} to render, {skipped_count} unchanged.", flush=True)
+
+    def record_result(base_name, success):
+        """Stores the fingerprint of each successful render right away."""
+        entry = pending_entries.get(base_name)
+        if success and entry:
+            record_render(manifest, manifest_path, base_name, entry, args)
+
+    # 6. Prepare audio once per distinct track (cached by content hash)
+    prepared_audio = {}
+    if render_jobs and not args.no_audio_cache:
+        known_hashes = {name: entry["inputs"]["audio"]["sha256"] for name, entry in pending_entries.items()}
+        prepared_audio = prepare_audio_batch(render_jobs, args, known_hashes)
+
+    # 7. Render (sequentially or in a worker pool)
+    success_count = 0
+    for base_name, success in render_batch(render_jobs, args, on_result=record_result, prepared_audio=prepared_audio):
+        if success:
+            success_count += 1
         else:
-             fail_count += 1
+            fail_count += 1
+            failed_names.append(base_name)
 
     print("\n--- Batch Process Summary ---", flush=True)
     print(f"Successfully created: {success_count}", flush=True)
+    print(f"Unchanged (not re-encoded): {skipped_count}", flush=True)
     print(f"Failed or skipped: {fail_count}", flush=True)
+    if failed_names:
+        print(f"Failed entries: {', '.join(sorted(str(n) for n in failed_names))}", flush=True)
     print("--- Finished Batch Quote Video Creation ---", flush=True)
 
 # --- Command-Line Argument Parsing ---
 
-if __name__ == "__main__":
+def build_arg_parser():
+    """Builds the command-line parser (also used by benchmark_videos.py)."""
     parser = argparse.ArgumentParser(description="Create videos from images, audio, and quotes.")
 
     # --- Input Files ---
@@ -273,6 +1212,9 @@ if __name__ == "__main__":
     parser.add_argument("--fade-duration", type=float, default=2.0, help="Duration (seconds) for the text fade-in effect (default: 2.0).")
     parser.add_argument("--include-author", action='store_true', help="Include the author ('comment' field from JSON) below the quote.")
 
+    parser.add_argument("--text-renderer", choices=["drawtext", "overlay"], default="drawtext", help="'drawtext' draws the text in FFmpeg on every frame; 'overlay' lays it out once with Pillow and overlays the PNG (default: drawtext).")
+    parser.add_argument("--text-max-width", type=float, default=0.85, help="Overlay renderer: max text line width as a fraction of the video width (default: 0.85).")
+
     # --- Watermark Styling ---
     parser.add_argument("--watermark-text", default="", help="Text for the watermark (optional).")
     parser.add_argument("--watermark-font-size", type=int, default=25, help="Font size for the watermark (default: 25).")
@@ -281,9 +1223,44 @@ if __name__ == "__main__":
 
     # --- Video Options ---
     parser.add_argument("--scale", default="", help="Optional: Scale video resolution (e.g., '1080:1920' for portrait).")
+    parser.add_argument("--output-profiles", nargs="+", default=[], metavar="NAME[=DIR]", help=f"Render several variants from one composite in a single FFmpeg run ({', '.join(OUTPUT_PROFILES)}). 'short' goes to --output-dir, others to <output-dir>/<name> unless '=DIR' is given (default: one classic output).")
     parser.add_argument("--duration", type=float, default=0, help="Optional: Force video duration in seconds (e.g., 15). If 0 or omitted, uses audio duration (default: 0).")
 
-    args = parser.parse_args()
+    # --- Encoding ---
+    parser.add_argument("--preset", default="fast", help="libx264 preset (default: fast).")
+    parser.add_argument("--crf", type=int, default=23, help="libx264 CRF, lower is better quality (default: 23).")
+    parser.add_argument("--still-image", action='store_true', help="Still-image profile: scale the background once, read it at a low rate, skip duplicate frames after the fade-in, use -tune stillimage and a long GOP.")
+    parser.add_argument("--fps", type=float, default=30, help="Still-image profile: output frame rate of the fade-in; later frames stay on this time grid (default: 30).")
+    parser.add_argument("--still-hold", type=float, default=1.0, help="Still-image profile: seconds between frames once the fade-in is done (default: 1.0).")
+    parser.add_argument("--still-input-fps", type=float, default=1, help="Still-image profile: rate the background image is read at before being duplicated to --fps (default: 1).")
+
+    # --- Audio ---
+    parser.add_argument("--audio-cache-dir", default="", help=f"Where prepared AAC audio is cached (default: <audio-dir>/../{AUDIO_CACHE_DIR_NAME}).")
+    parser.add_argument("--no-audio-cache", action='store_true', help="Encode audio inside each video encode instead of preparing it once.")
+
+    # --- Watch Mode ---
+    parser.add_argument("--watch", action='store_true', help="Keep running: watch the image/audio dirs and the quotes JSON and render entries as soon as they are complete.")
+    parser.add_argument("--watch-interval", type=float, default=2.0, help="Watch mode: seconds between scans (inotify wakes earlier on Linux) (default: 2).")
+    parser.add_argument("--settle-seconds", type=float, default=3.0, help="Watch mode: an entry's files must be unchanged this long before rendering (default: 3).")
+
+    # --- Performance ---
+    parser.add_argument("--jobs", type=int, default=1, help="Number of videos to render in parallel (default: 1).")
+    parser.add_argument("--manifest", default="", help=f"Path to the render manifest (default: <output-dir>/{RENDER_MANIFEST_FILE}).")
+    parser.add_argument("--force", action='store_true', help="Re-render every entry even if its inputs are unchanged.")
+    parser.add_argument("--stall-timeout", type=float, default=120, help="Kill an encode whose progress hasn't advanced for this many seconds; 0 disables (default: 120).")
+    parser.add_argument("--max-load-per-cpu", type=float, default=governor.DEFAULT_LIMITS["governor_max_load_per_cpu"], help="Only start another parallel encode while the 1-minute load per CPU is below this (default: %(default)s).")
+    parser.add_argument("--min-free-memory-mb", type=int, default=governor.DEFAULT_LIMITS["governor_min_free_memory_mb"], help="Memory (MB) to keep free when starting another parallel encode (default: %(default)s).")
+    parser.add_argument("--no-governor", action='store_true', help="Start parallel encodes without checking load and free memory.")
+    parser.add_argument("--threads", type=int, default=0, help="libx264 threads per job. 0 = auto (all cores for one job, cores split evenly across --jobs) (default: 0).")
+
+    return parser
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+
+    if args.text_renderer == "overlay" and not PIL_AVAILABLE:
+        print(" ERROR: --text-renderer overlay needs Pillow (pip install Pillow).", flush=True)
+        sys.exit(1)
 
     # Run the main process
     main(args)
\ No newline at end of file
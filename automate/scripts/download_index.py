@@ -0,0 +1,244 @@
+import os
+import re
+import sqlite3
+import datetime
+import threading
+from pathlib import Path
+
+# --- Constants ---
+# Index file sits next to the category's download folder: <parent>/<folder>_download_index.sqlite
+INDEX_FILE_SUFFIX = "_download_index.sqlite"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    filename      TEXT PRIMARY KEY,
+    stem          TEXT NOT NULL,
+    extension     TEXT NOT NULL,
+    size          INTEGER,
+    shortcode     TEXT,
+    post_key      TEXT,
+    downloaded_at TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_downloads_shortcode ON downloads(shortcode) WHERE shortcode IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_downloads_stem ON downloads(stem);
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS journal (
+    shortcode  TEXT PRIMARY KEY,
+    post_key   TEXT,
+    status     TEXT NOT NULL,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_journal_status ON journal(status);
+CREATE TABLE IF NOT EXISTS post_meta (
+    shortcode  TEXT PRIMARY KEY,
+    is_video   INTEGER,
+    owner      TEXT,
+    caption    TEXT,
+    video_url  TEXT,
+    duration   REAL,
+    posted_at  REAL,
+    fetched_at TEXT
+);
+"""
+POST_META_FIELDS = ("is_video", "owner", "caption", "video_url", "duration", "posted_at")
+# Journal states of a post
+JOURNAL_PENDING = "pending"
+JOURNAL_IN_FLIGHT = "in_flight"
+JOURNAL_DONE = "done"
+JOURNAL_FAILED = "failed"
+JOURNAL_NOT_VIDEO = "not_video"
+JOURNAL_DUPLICATE = "duplicate" # Same video already kept elsewhere (see content_registry)
+JOURNAL_TOO_LONG = "too_long"   # Longer than the category's download_max_duration
+
+def get_index_path(save_folder):
+    """Index path for a download folder (kept beside it, not inside it)."""
+    save_folder = os.path.abspath(save_folder)
+    return os.path.join(os.path.dirname(save_folder), os.path.basename(save_folder) + INDEX_FILE_SUFFIX)
+
+def read_post_meta_for_file(save_folder, filename):
+    """
+    Cached post metadata (caption, owner, ...) for a saved file, or None. Opens the
+    index read-only, so it is safe to call from the web controller.
+    """
+    index_path = get_index_path(save_folder)
+    if not os.path.exists(index_path):
+        return None
+    try:
+        conn = sqlite3.connect(Path(index_path).as_uri() + "?mode=ro", uri=True)
+        try:
+            row = conn.execute(
+                "SELECT " + ", ".join("m." + field for field in POST_META_FIELDS) + " FROM downloads d "
+                "JOIN post_meta m ON m.shortcode = d.shortcode WHERE d.filename = ?", (filename,)).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return dict(zip(POST_META_FIELDS, row)) if row else None
+
+class DownloadIndex:
+    """
+    Per-category record of saved reels: shortcode/post key -> filename, extension
+    and size, the next prefix_number counter, and a journal of each post's
+    download state (pending / in_flight / done / failed / not_video / duplicate /
+    too_long) so a rerun continues where the last one stopped, and cached post
+    metadata. Thread-safe (one shared connection behind a lock).
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.is_new = not os.path.exists(index_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Lookups ---
+
+    def has_shortcode(self, shortcode):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM downloads WHERE shortcode = ?", (shortcode,)).fetchone() is not None
+
+    def has_stem(self, stem):
+        """True if any saved file has this name (without extension)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM downloads WHERE stem = ? LIMIT 1", (stem,)).fetchone() is not None
+
+    def has_filename(self, filename):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM downloads WHERE filename = ?", (filename,)).fetchone() is not None
+
+    def get_filename(self, shortcode):
+        with self._lock:
+            row = self._conn.execute("SELECT filename FROM downloads WHERE shortcode = ?", (shortcode,)).fetchone()
+            return row[0] if row else None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM downloads").fetchone()[0]
+
+    # --- Updates ---
+
+    def next_number(self, prefix):
+        """Allocates the next prefix_number value (1, 2, ...)."""
+        name = f"prefix:{prefix}"
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)", (name,))
+            self._conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (name,))
+            return self._conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+    def record(self, filename, size=None, shortcode=None, post_key=None):
+        """Adds (or replaces) a saved file."""
+        stem, extension = os.path.splitext(filename)
+        with self._lock, self._conn:
+            if shortcode:
+                # A shortcode belongs to one file; drop a stale row from an earlier save
+                self._conn.execute("DELETE FROM downloads WHERE shortcode = ? AND filename != ?", (shortcode, filename))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads (filename, stem, extension, size, shortcode, post_key, downloaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (filename, stem, extension.lower(), size, shortcode, post_key,
+                 datetime.datetime.now().isoformat(timespec="seconds")))
+
+    def remove(self, filename):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM downloads WHERE filename = ?", (filename,))
+
+    # --- Journal (per-post progress, survives restarts) ---
+
+    def journal_status(self, shortcode):
+        """Returns (status, attempts, last_error) for a post, or None if never seen."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT status, attempts, last_error FROM journal WHERE shortcode = ?", (shortcode,)).fetchone()
+
+    def journal_update(self, shortcode, post_key, status, error=None, new_attempt=False):
+        """Sets a post's status; `new_attempt` counts another try."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO journal (shortcode, post_key, status, attempts, last_error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(shortcode) DO UPDATE SET post_key = excluded.post_key, status = excluded.status, "
+                "attempts = attempts + ?, last_error = COALESCE(excluded.last_error, last_error), "
+                "updated_at = excluded.updated_at",
+                (shortcode, post_key, status, 1 if new_attempt else 0, error,
+                 datetime.datetime.now().isoformat(timespec="seconds"), 1 if new_attempt else 0))
+
+    def journal_recover(self):
+        """Marks posts left in flight by an interrupted run as pending again. Returns how many."""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE journal SET status = ? WHERE status = ?", (JOURNAL_PENDING, JOURNAL_IN_FLIGHT)).rowcount
+
+    def journal_counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM journal GROUP BY status").fetchall())
+
+    # --- Post metadata (cached so photos and long clips are never fetched twice) ---
+
+    def get_post_meta(self, shortcode):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT " + ", ".join(POST_META_FIELDS) + " FROM post_meta WHERE shortcode = ?", (shortcode,)).fetchone()
+        return dict(zip(POST_META_FIELDS, row)) if row else None
+
+    def save_post_meta(self, shortcode, meta):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO post_meta (shortcode, " + ", ".join(POST_META_FIELDS) + ", fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (shortcode,) + tuple(meta.get(field) for field in POST_META_FIELDS)
+                + (datetime.datetime.now().isoformat(timespec="seconds"),))
+
+    def rebuild(self, folders, video_extensions, prefix=None, shortcode_by_stem=None):
+        """
+        Re-creates the index from the files in `folders` (e.g. download and
+        uploaded dirs). Shortcodes already known for files that still exist are
+        kept; `shortcode_by_stem` can fill in others. Re-seeds the prefix counter
+        from the highest '<prefix>-NNN' file found. Returns the number of files indexed.
+        """
+        shortcode_by_stem = dict(shortcode_by_stem or {})
+        with self._lock:
+            known = {row[0]: (row[1], row[2]) for row in
+                     self._conn.execute("SELECT filename, shortcode, post_key FROM downloads")}
+
+        pattern = re.compile(rf"^{re.escape(prefix)}-(\d+)$") if prefix else None
+        rows, max_number, seen_shortcodes = {}, 0, set()
+        for folder in folders:
+            if not folder or not os.path.isdir(folder):
+                continue
+            for entry in os.scandir(folder):
+                stem, extension = os.path.splitext(entry.name)
+                if not entry.is_file() or extension.lower() not in video_extensions or entry.name in rows:
+                    continue
+                shortcode, post_key = known.get(entry.name, (None, None))
+                shortcode = shortcode or shortcode_by_stem.get(stem)
+                if shortcode in seen_shortcodes:
+                    shortcode = None
+                if shortcode:
+                    seen_shortcodes.add(shortcode)
+                rows[entry.name] = (entry.name, stem, extension.lower(), entry.stat().st_size, shortcode, post_key, None)
+                match = pattern.match(stem) if pattern else None
+                if match:
+                    max_number = max(max_number, int(match.group(1)))
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM downloads")
+            self._conn.executemany(
+                "INSERT INTO downloads (filename, stem, extension, size, shortcode, post_key, downloaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", list(rows.values()))
+            if prefix:
+                self._conn.execute("INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)",
+                                   (f"prefix:{prefix}", max_number))
+        return len(rows)
@@ -8,13 +8,58 @@ except AttributeError:
 import os
 import json
 import shutil
+import time
+import random
 import instaloader
+import requests
 import re
 import argparse
+import threading
+import contextlib
+from pathlib import Path
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+if __name__ == "__main__":
+    import download_index
+    import instagram_throttle
+    import content_registry
+    import video_normalize
+    import controller_lock
+else:
+    try:
+        from scripts import download_index, instagram_throttle, content_registry, video_normalize, controller_lock
+    except ImportError:
+        import download_index # Imported by a script run from this folder
+        import instagram_throttle
+        import content_registry
+        import video_normalize
+        import controller_lock
 
 # --- Constants ---
 VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.webm', '.mpeg', '.mpg', '.3gp'}
+# Defaults for the per-category download_workers / download_max_concurrent_requests keys
+DEFAULT_DOWNLOAD_WORKERS = 4
+DEFAULT_MAX_CONCURRENT_REQUESTS = 3
+# Direct streaming of the video URL (fast path; falls back to download_post)
+STREAM_CHUNK_SIZE = 1024 * 1024
+STREAM_TIMEOUT = (10, 60) # (connect, read) seconds
+PART_FILE_PATTERN = ".{}.part" # Hidden, so it never looks like a finished download; kept between attempts to resume
+# Retries (per-category download_max_attempts): exponential backoff with jitter
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 2   # seconds before the 2nd attempt; doubles each time
+RETRY_MAX_DELAY = 60
+# Failures that another attempt won't fix (post removed, private, login needed)
+PERMANENT_ERRORS = (
+    instaloader.exceptions.QueryReturnedNotFoundException,
+    instaloader.exceptions.PrivateProfileNotFollowedException,
+    instaloader.exceptions.LoginRequiredException,
+)
+# Harvest mode (category "harvest_profiles": ["username", "#hashtag", ...])
+# Known posts among a profile's first few may be pinned, so (as in Instaloader's fast-update) they don't end the walk
+POSSIBLY_PINNED = 3
+DEFAULT_HARVEST_MAX_POSTS = 50 # Per source and run; bounds the first sync of a new profile
+HARVEST_PAGE_SIZE = 12 # Posts per feed request
 
 # --- Helper Functions ---
 
@@ -46,104 +91,467 @@ def get_shortcode_from_url(url):
     except Exception:
         return None
 
-def download_and_rename_media(url, post_key, loader, save_folder, naming_scheme="post_key", prefix=None):
+def find_session_file(script_dir=None):
+    """Returns the first session-<username> file next to this script, or None."""
+    script_dir = script_dir or os.path.dirname(os.path.abspath(__file__))
+    for f in sorted(os.listdir(script_dir)):
+        if f.startswith("session-"):
+            return os.path.join(script_dir, f)
+    return None
+
+def make_loader(session_file=None, quiet=False):
+    """Builds an Instaloader (one per worker thread; they are not thread-safe) and loads the session."""
+    loader = instaloader.Instaloader(
+        download_pictures=False,
+        download_video_thumbnails=False,
+        download_geotags=False,
+        download_comments=False,
+        save_metadata=False,
+        compress_json=False,
+        filename_pattern="{profile}_{shortcode}",
+        quiet=quiet,
+        max_connection_attempts=1 # Failures go straight to our retries/throttle instead of Instaloader's own waits
+    )
+    if session_file:
+        try:
+            loader.load_session_from_file(os.path.basename(session_file).replace("session-", ""), session_file)
+            if not quiet: print("[Auth] Logged in successfully.", flush=True)
+        except Exception as e:
+            print(f"[Warn] Could not load session: {e}", flush=True)
+    return loader
+
+def get_potential_base(post_key, naming_scheme):
+    """File name (without extension) a post would get under post_key/base_name naming."""
+    if naming_scheme == "base_name":
+        m = re.match(r"(\d+)_video", post_key)
+        if m: return m.group(1)
+    return post_key
+
+def choose_final_path(save_folder, post_key, file_ext, naming_scheme, prefix, index=None):
+    """
+    Picks the destination path in save_folder (call with the naming lock held).
+    With a DownloadIndex, numbering and duplicate checks are index lookups
+    instead of folder scans.
+    """
+    if naming_scheme == "prefix_number":
+        if index:
+            number = index.next_number(prefix)
+        else:
+            number = 0
+            pattern = re.compile(rf"^{prefix}-(\d{{3}}){re.escape(file_ext)}$")
+            for existing_file in os.listdir(save_folder):
+                match = pattern.match(existing_file)
+                if match:
+                    num = int(match.group(1))
+                    if num > number: number = num
+            number += 1
+        new_name = f"{prefix}-{number:03d}{file_ext}"
+    elif naming_scheme == "base_name":
+        new_name = f"{get_potential_base(post_key, naming_scheme)}{file_ext}"
+    else:
+        new_name = f"{post_key}{file_ext}"
+
+    def is_taken(name):
+        if index and index.has_filename(name): return True
+        return os.path.exists(os.path.join(save_folder, name))
+
+    # Handle duplicates
+    final_name = new_name
+    counter = 1
+    while is_taken(final_name):
+        name_part, ext_part = os.path.splitext(new_name)
+        final_name = f"{name_part}_({counter}){ext_part}"
+        counter += 1
+    return os.path.join(save_folder, final_name)
+
+def rebuild_download_index(index, category_config, links_data=None):
+    """Re-indexes the category's download and uploaded folders from disk."""
+    naming_scheme = category_config.get("download_naming_scheme", "post_key")
+    shortcode_by_stem = {}
+    if naming_scheme != "prefix_number":
+        # Names derived from post keys can be matched back to the current links
+        for post_key, entry in (links_data or {}).items():
+            url = entry if isinstance(entry, str) else entry.get("url")
+            shortcode = get_shortcode_from_url(url.strip()) if url else None
+            if shortcode:
+                shortcode_by_stem[get_potential_base(post_key, naming_scheme)] = shortcode
+    folders = [category_config.get("download_target_dir"), category_config.get("uploaded_dir")]
+    count = index.rebuild(folders, VIDEO_EXTENSIONS, category_config.get("download_prefix"), shortcode_by_stem)
+    print(f"[Index] Rebuilt download index from disk: {count} files ({os.path.basename(index.index_path)}).", flush=True)
+    return count
+
+def make_http_session(pool_size=DEFAULT_MAX_CONCURRENT_REQUESTS):
+    """requests.Session with a keep-alive connection pool for CDN downloads."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = instaloader.instaloadercontext.default_user_agent()
+    return session
+
+def get_video_extension(video_url):
+    """File extension from a CDN video URL (defaults to .mp4)."""
+    ext = os.path.splitext(urlparse(video_url).path)[1].lower()
+    return ext if ext in VIDEO_EXTENSIONS else ".mp4"
+
+def get_retry_delay(attempt):
+    """Backoff before the next attempt: doubles per attempt (capped), half of it random jitter."""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def stream_video_to_file(video_url, session, part_path, mtime=None):
+    """
+    Streams a video URL in chunks to `part_path`. An existing partial file is
+    resumed with a Range request; if the server ignores it (200) the file is
+    restarted. Raises on failure and keeps what arrived for the next attempt.
+    """
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with session.get(video_url, stream=True, timeout=STREAM_TIMEOUT, headers=headers) as response:
+        if offset and response.status_code == 416:
+            # Partial file doesn't fit this video (e.g. it changed); start over
+            os.remove(part_path)
+            return stream_video_to_file(video_url, session, part_path, mtime)
+        response.raise_for_status()
+
+        if offset and response.status_code == 206:
+            # Content-Range: bytes <start>-<end>/<total>
+            match = re.match(r"bytes (\d+)-\d+/(\d+|\*)", response.headers.get("Content-Range", ""))
+            if not match or int(match.group(1)) != offset:
+                os.remove(part_path)
+                raise IOError(f"unexpected Content-Range '{response.headers.get('Content-Range')}'")
+            expected = int(match.group(2)) if match.group(2) != "*" else 0
+            mode = "ab"
+            print(f"  > Resuming at {offset // 1024} KB", flush=True)
+        else:
+            offset = 0
+            expected = int(response.headers.get("Content-Length") or 0)
+            mode = "wb"
+
+        written = offset
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                f.write(chunk)
+                written += len(chunk)
+    if expected and written != expected:
+        raise IOError(f"got {written} of {expected} bytes")
+    if mtime:
+        os.utime(part_path, (time.time(), mtime)) # Same as Instaloader: mtime = post date
+
+def get_post_meta(post):
+    """Fields cached per post in the download index (video URL may be an extra request when logged in)."""
+    return {
+        "is_video": post.is_video,
+        "owner": post.owner_username,
+        "caption": post.caption,
+        "video_url": post.video_url if post.is_video else None,
+        "duration": post.video_duration if post.is_video else None,
+        "posted_at": post.date_utc.timestamp(),
+    }
+
+def get_meta_skip_reason(meta, max_duration=None):
+    """Journal status for a post that shouldn't be downloaded (not a video / too long), or None."""
+    if not meta.get("is_video"):
+        return download_index.JOURNAL_NOT_VIDEO
+    if max_duration and meta.get("duration") and meta["duration"] > max_duration:
+        return download_index.JOURNAL_TOO_LONG
+    return None
+
+def _download_post_once(shortcode, post_key, loader, save_folder, naming_scheme, prefix,
+                        request_slots, name_lock, index, http_session, temp_dir, part_path, throttle=None,
+                        post=None):
+    """
+    One attempt at a post. Returns a journal status (done / not_video / failed);
+    raises on errors worth retrying. `post` skips the metadata request if it was prefetched.
+    """
+    request = throttle.request if throttle else (lambda paced=True: contextlib.nullcontext())
+    streamed = False
+    try:
+        with request_slots:
+            if post is None:
+                with request():
+                    post = instaloader.Post.from_shortcode(loader.context, shortcode)
+                    if index:
+                        index.save_post_meta(shortcode, get_post_meta(post))
+            is_video = post.is_video
+            if not is_video:
+                print(f"[Info] {post_key} is not a video.", flush=True)
+                return download_index.JOURNAL_NOT_VIDEO
+            video_url = post.video_url if http_session else None
+            if video_url:
+                try:
+                    # CDN fetch: not paced, but it waits out (and can trigger) a cooldown
+                    with request(paced=False):
+                        stream_video_to_file(video_url, http_session, part_path, post.date_utc.timestamp())
+                    streamed = True
+                except requests.HTTPError as e:
+                    # CDN refused the URL; Instaloader fetches it its own way. Network
+                    # errors propagate instead, so the retry resumes the part file.
+                    print(f"[Warn] Direct download failed ({e}); falling back to Instaloader.", flush=True)
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+            if not streamed:
+                # Cleanup old temp dir if exists
+                if os.path.exists(temp_dir):
+                    try:
+                        shutil.rmtree(temp_dir)
+                    except: pass
+                # A Path target is used as-is (a str would be sanitised into a single folder name)
+                with request():
+                    loader.download_post(post, target=Path(temp_dir))
+
+        if streamed:
+            file_ext = get_video_extension(video_url)
+            # Atomic rename: the real name only ever points at a complete file
+            with name_lock:
+                final_path = choose_final_path(save_folder, post_key, file_ext, naming_scheme, prefix, index)
+                os.replace(part_path, final_path)
+                if index:
+                    index.record(os.path.basename(final_path), os.path.getsize(final_path), shortcode, post_key)
+            print(f"[OK] Saved as: {os.path.basename(final_path)}", flush=True)
+            return download_index.JOURNAL_DONE
+
+        video_file_name = None
+        if os.path.exists(temp_dir):
+            for filename in os.listdir(temp_dir):
+                if os.path.splitext(filename)[1].lower() in VIDEO_EXTENSIONS:
+                    video_file_name = filename
+                    break
+
+        if not video_file_name:
+            print(f"[WARN] No video file found inside {os.path.basename(temp_dir)}.", flush=True)
+            return download_index.JOURNAL_FAILED
+
+        old_path = os.path.join(temp_dir, video_file_name)
+        file_ext = os.path.splitext(video_file_name)[1]
+        # Pick the name and move while holding the lock so two workers never get the same number
+        with name_lock:
+            final_path = choose_final_path(save_folder, post_key, file_ext, naming_scheme, prefix, index)
+            shutil.move(old_path, final_path)
+            if index:
+                index.record(os.path.basename(final_path), os.path.getsize(final_path), shortcode, post_key)
+        print(f"[OK] Saved as: {os.path.basename(final_path)}", flush=True)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return download_index.JOURNAL_DONE
+
+    finally:
+        if os.path.exists(temp_dir):
+            try: shutil.rmtree(temp_dir)
+            except: pass
+
+def download_and_rename_media(url, post_key, loader, save_folder, naming_scheme="post_key", prefix=None,
+                              request_slots=None, name_lock=None, index=None, http_session=None,
+                              max_attempts=1, throttle=None, post=None, on_attempt=None):
+    """
+    Downloads one reel into save_folder (absolute paths only, no chdir, so it is thread-safe).
+    With `http_session`, the video URL is streamed straight to a hidden part file in
+    save_folder and renamed into place; otherwise (or if the CDN refuses) Instaloader
+    downloads into a temp folder.
+    `request_slots` caps concurrent Instagram requests; `name_lock` serialises picking the final name.
+    Failed attempts are retried up to `max_attempts` times with backoff, resuming the part file.
+    `throttle` (AdaptiveThrottle) paces Instagram requests and backs off when rate-limited.
+    A prefetched `post` is used for the first attempt (retries fetch it again for a fresh video URL).
+    With `index` (DownloadIndex), saved files and each post's journal status are recorded.
+    `on_attempt(attempt, status, error, elapsed)` is called after every attempt (elapsed excludes retry backoff).
+    """
     shortcode = get_shortcode_from_url(url)
     if not shortcode:
         print(f"[WARN] Invalid URL format for {post_key}: {url}", flush=True)
         return False
 
-    # FIX: Store original directory to return to it later
-    original_cwd = os.getcwd()
-    
-    # Change working directory to the save_folder to avoid Instaloader path issues
-    try:
-        os.chdir(save_folder)
-    except Exception as e:
-        print(f"[Error] Could not access download folder: {e}", flush=True)
-        return False
-
-    temp_dir_name = f"temp_{post_key}"
-    
-    # Cleanup old temp dir if exists
-    if os.path.exists(temp_dir_name):
+    request_slots = request_slots or threading.BoundedSemaphore(1)
+    name_lock = name_lock or threading.Lock()
+    temp_dir = os.path.join(os.path.abspath(save_folder), f"temp_{post_key}")
+    # Named by shortcode only, so a rerun resumes it even if post keys were renumbered
+    part_path = os.path.join(os.path.abspath(save_folder), PART_FILE_PATTERN.format(shortcode))
+
+    for attempt in range(1, max(1, max_attempts) + 1):
+        if index:
+            index.journal_update(shortcode, post_key, download_index.JOURNAL_IN_FLIGHT, new_attempt=True)
+        print(f"[..] Downloading {post_key} ({shortcode})" + (f", attempt {attempt}/{max_attempts}" if attempt > 1 else "") + "...", flush=True)
+        attempt_started = time.perf_counter()
         try:
-            shutil.rmtree(temp_dir_name)
-        except: pass
-
-    success = False
+            status = _download_post_once(shortcode, post_key, loader, save_folder, naming_scheme, prefix,
+                                         request_slots, name_lock, index, http_session, temp_dir, part_path,
+                                         throttle, post if attempt == 1 else None)
+            error = None if status != download_index.JOURNAL_FAILED else "no video file in download"
+            retry = False
+        except Exception as e:
+            status, error = download_index.JOURNAL_FAILED, f"{type(e).__name__}: {e}"
+            # Rate limits are always worth another try (after the throttle's cooldown)
+            retry = instagram_throttle.is_rate_limit_error(e) or not isinstance(e, PERMANENT_ERRORS)
+
+        if index:
+            index.journal_update(shortcode, post_key, status, error)
+        if on_attempt:
+            on_attempt(attempt, status, error, time.perf_counter() - attempt_started)
+        if status != download_index.JOURNAL_FAILED:
+            if status == download_index.JOURNAL_NOT_VIDEO and os.path.exists(part_path):
+                os.remove(part_path)
+            return status == download_index.JOURNAL_DONE
+
+        if retry and attempt < max_attempts:
+            delay = get_retry_delay(attempt)
+            print(f"[Retry] {post_key}: {error} (next attempt in {delay:.1f}s)", flush=True)
+            time.sleep(delay)
+            continue
+        print(f"[Error] Failed to download {post_key}: {error}", flush=True)
+        return False
+    return False
+
+def link_known_duplicate(registry, index, existing, save_folder, post_key, shortcode, category_name,
+                         naming_scheme, prefix, name_lock):
+    """Hard-links a reel another category already has into save_folder. Returns False if it can't."""
+    source_path, source_category, _, sha256 = existing
+    with name_lock:
+        final_path = choose_final_path(save_folder, post_key, os.path.splitext(source_path)[1], naming_scheme, prefix, index)
+        if not content_registry.hard_link(source_path, final_path):
+            return False
+        index.record(os.path.basename(final_path), os.path.getsize(final_path), shortcode, post_key)
+    registry.register(final_path, category_name, "download", shortcode, sha256)
+    index.journal_update(shortcode, post_key, download_index.JOURNAL_DONE)
+    print(f"[Link] {post_key} ({shortcode}) already in {source_category}; linked as {os.path.basename(final_path)}.", flush=True)
+    return True
+
+def normalize_saved_video(index, save_folder, shortcode, post_key, ffmpeg_path, ffprobe_path=None):
+    """
+    Verifies a fresh download and remuxes it (faststart, extra streams dropped).
+    A corrupt file is quarantined and journaled as failed, so the next run
+    fetches it again. Returns False if it was quarantined.
+    """
+    filename = index.get_filename(shortcode)
+    if not filename:
+        return True
+    path = os.path.join(save_folder, filename)
+    ok, message = video_normalize.normalize_video(path, ffmpeg_path, ffprobe_path)
+    if ok:
+        index.record(filename, os.path.getsize(path), shortcode, post_key) # Size changes with the remux
+        return True
+    quarantined = video_normalize.quarantine_file(path)
+    index.remove(filename)
+    index.journal_update(shortcode, post_key, download_index.JOURNAL_FAILED, f"corrupt: {message}")
+    print(f"[Quarantine] {filename} is corrupt ({message}); moved to {os.path.relpath(quarantined, save_folder)}.", flush=True)
+    return False
+
+def check_saved_duplicate(registry, index, save_folder, shortcode, post_key, category_name, duplicate_policy):
+    """
+    Hashes a fresh download and looks for the same content anywhere on disk (this
+    also catches a reel reposted under another shortcode). Per `duplicate_policy`
+    the new file is dropped (skip), turned into a hard link (link) or kept.
+    Returns False if it was dropped.
+    """
+    filename = index.get_filename(shortcode)
+    if not filename:
+        return True
+    path = os.path.join(save_folder, filename)
+    sha256 = registry.register(path, category_name, "download", shortcode)
+    others = registry.find_hash(sha256, exclude_path=path)
+    if not others or duplicate_policy == "download":
+        return True
+    other_path, other_category, other_location = others[0]
+    other_name = f"{other_category}/{other_location}/{os.path.basename(other_path)}"
+
+    if duplicate_policy == "link":
+        temp_path = os.path.join(save_folder, PART_FILE_PATTERN.format(f"{shortcode}.link"))
+        if content_registry.hard_link(other_path, temp_path):
+            os.replace(temp_path, path)
+            registry.register(path, category_name, "download", shortcode, sha256)
+            print(f"[Link] {filename} is the same video as {other_name}; replaced by a hard link.", flush=True)
+        return True
 
-    try:
-        print(f"[..] Downloading {post_key} ({shortcode})...", flush=True)
-        post = instaloader.Post.from_shortcode(loader.context, shortcode)
-
-        if post.is_video:
-            # Download to relative folder name (safe)
-            loader.download_post(post, target=temp_dir_name)
-
-            video_file_name = None
-            if os.path.exists(temp_dir_name):
-                for filename in os.listdir(temp_dir_name):
-                    if os.path.splitext(filename)[1].lower() in VIDEO_EXTENSIONS:
-                        video_file_name = filename
-                        break
-
-            if video_file_name:
-                old_path = os.path.join(temp_dir_name, video_file_name)
-                file_ext = os.path.splitext(video_file_name)[1]
-                new_name = ""
-
-                # Determine New Name
-                if naming_scheme == "post_key":
-                    new_name = f"{post_key}{file_ext}"
-                elif naming_scheme == "prefix_number":
-                    max_num = 0
-                    pattern = re.compile(rf"^{prefix}-(\d{{3}}){re.escape(file_ext)}$")
-                    # Scan current directory (save_folder)
-                    for existing_file in os.listdir("."):
-                        match = pattern.match(existing_file)
-                        if match:
-                            num = int(match.group(1))
-                            if num > max_num: max_num = num
-                    new_name = f"{prefix}-{max_num + 1:03d}{file_ext}"
-                elif naming_scheme == "base_name":
-                      base_name_match = re.match(r"(\d+)_video", post_key)
-                      if base_name_match: new_name = f"{base_name_match.group(1)}{file_ext}"
-                      else: new_name = f"{post_key}{file_ext}"
-                else:
-                    new_name = f"{post_key}{file_ext}"
-
-                # Handle duplicates
-                final_name = new_name
-                counter = 1
-                while os.path.exists(final_name):
-                      name_part, ext_part = os.path.splitext(new_name)
-                      final_name = f"{name_part}_({counter}){ext_part}"
-                      counter += 1
-
-                # Move file from temp folder to current folder (save_folder)
-                shutil.move(old_path, final_name)
-                print(f"[OK] Saved as: {final_name}", flush=True)
-                success = True
-            else:
-                print(f"[WARN] No video file found inside {temp_dir_name}.", flush=True)
+    os.remove(path)
+    index.remove(filename)
+    registry.unregister(path)
+    index.journal_update(shortcode, post_key, download_index.JOURNAL_DUPLICATE, f"same video as {other_name}")
+    print(f"[Dup] {post_key} is the same video as {other_name}; not kept.", flush=True)
+    return False
+
+def get_reel_url(shortcode):
+    return f"https://www.instagram.com/reel/{shortcode}/"
+
+def harvest_source(loader, source, is_known, max_posts=DEFAULT_HARVEST_MAX_POSTS, throttle=None):
+    """
+    Walks a profile's (or "#hashtag"'s) posts newest-first until the first
+    already-known shortcode, so a sync only pages through what is new (one
+    page of 12 posts per request). Pinned posts are skipped.
+    Returns (new video shortcodes newest-first, new non-video shortcodes).
+    """
+    request = throttle.request if throttle else (lambda paced=True: contextlib.nullcontext())
+    with request():
+        if source.startswith("#"):
+            posts = instaloader.Hashtag.from_name(loader.context, source[1:]).get_posts_resumable()
         else:
-            print(f"[Info] {post_key} is not a video.", flush=True)
-
+            posts = instaloader.Profile.from_username(loader.context, source.lstrip("@")).get_posts()
+    videos, others = [], []
+    for position in range(1, max_posts + 1):
+        # The first page came with the listing; the next one is fetched after every HARVEST_PAGE_SIZE posts
+        next_page = position > 1 and position % HARVEST_PAGE_SIZE == 1
+        with request() if next_page else contextlib.nullcontext():
+            post = next(posts, None)
+        if post is None:
+            break
+        if post.is_pinned:
+            continue
+        if is_known(post.shortcode):
+            if source.startswith("#") or position > POSSIBLY_PINNED:
+                break
+            continue
+        (videos if post.is_video else others).append(post.shortcode)
+    return videos, others
+
+def save_harvested_links(controller_path, category_name, new_links):
+    """
+    Adds harvested links to the category's json_data. Under the controller lock
+    (shared with extract_links) the file is re-read, so concurrent edits are kept.
+    """
+    try:
+        with controller_lock.ControllerLock(controller_path):
+            controller_data = load_json(controller_path)
+            if controller_data is None:
+                return False
+            links = controller_data.setdefault("json_data", {}).setdefault(category_name, {})
+            for post_key, url in new_links.items():
+                links.setdefault(post_key, url)
+            controller_lock.write_json_atomic(controller_data, controller_path)
+            return True
     except Exception as e:
-        print(f"[Error] Failed to download {post_key}: {e}", flush=True)
-    
-    finally:
-        # Cleanup temp dir
-        if os.path.exists(temp_dir_name):
-            try: shutil.rmtree(temp_dir_name)
-            except: pass
-        
-        # RESTORE ORIGINAL DIRECTORY
-        os.chdir(original_cwd)
+        print(f"[Error] Could not save harvested links to {controller_path}: {e}", flush=True)
+        return False
 
-    return success
+def harvest_links(category_name, controller_path, sources, loader, index, links_data, max_posts, throttle=None):
+    """
+    Syncs the category's harvest_profiles into its link data. A post counts as
+    known if it is in the link data or the download index/journal. Returns the new links.
+    """
+    known = {get_shortcode_from_url((entry if isinstance(entry, str) else entry.get("url") or "").strip())
+             for entry in links_data.values()}
 
-def main(category_name, controller_path):
+    def is_known(shortcode):
+        return shortcode in known or index.has_shortcode(shortcode) or index.journal_status(shortcode) is not None
+
+    new_links = {}
+    for source in sources:
+        try:
+            videos, others = harvest_source(loader, source, is_known, max_posts, throttle)
+        except Exception as e:
+            print(f"[Error] Could not list {source}: {type(e).__name__}: {e}", flush=True)
+            continue
+        for shortcode in others:
+            index.journal_update(shortcode, None, download_index.JOURNAL_NOT_VIDEO)
+        # Oldest first, so post keys follow posting order
+        name = source.lstrip("@#")
+        for shortcode in reversed(videos):
+            new_links[f"{name}_{shortcode}"] = get_reel_url(shortcode)
+            known.add(shortcode)
+        print(f"[Harvest] {source}: {len(videos)} new reels" + (f", {len(others)} photos skipped" if others else "") + ".", flush=True)
+
+    if new_links and save_harvested_links(controller_path, category_name, new_links):
+        print(f"[Harvest] Added {len(new_links)} links to {category_name}.", flush=True)
+    return new_links
+
+def main(category_name, controller_path, workers=None, rebuild_index=False, direct_stream=True, normalize=True,
+         harvest=False):
     print(f"--- Starting Download: {category_name} ---", flush=True)
 
     controller_data = load_json(controller_path)
@@ -157,77 +565,228 @@ def main(category_name, controller_path):
     save_folder = category_config.get("download_target_dir")
     naming_scheme = category_config.get("download_naming_scheme", "post_key")
     prefix = category_config.get("download_prefix")
-    links_data = controller_data.get("json_data", {}).get(category_name)
-
-    if not save_folder or not links_data:
+    links_data = controller_data.get("json_data", {}).get(category_name) or {}
+    workers = max(1, workers or category_config.get("download_workers", DEFAULT_DOWNLOAD_WORKERS))
+    max_requests = max(1, category_config.get("download_max_concurrent_requests", DEFAULT_MAX_CONCURRENT_REQUESTS))
+    max_attempts = max(1, category_config.get("download_max_attempts", DEFAULT_MAX_ATTEMPTS))
+    max_duration = category_config.get("download_max_duration") # Seconds; unset = no limit
+
+    harvest_sources = category_config.get("harvest_profiles") or []
+    if harvest and not harvest_sources:
+        print(f"[Info] No harvest_profiles configured for {category_name}.", flush=True)
+    harvest = harvest and bool(harvest_sources)
+
+    if not save_folder or not (links_data or harvest):
         print("[Info] Missing folder or links.", flush=True)
         return
 
     if not setup_folder(save_folder): return
-
-    # --- INSTALOADER CONFIG ---
-    L = instaloader.Instaloader(
-        download_pictures=False,
-        download_video_thumbnails=False,
-        download_geotags=False,
-        download_comments=False,
-        save_metadata=False,
-        compress_json=False,
-        filename_pattern="{profile}_{shortcode}"
-    )
+    save_folder = os.path.abspath(save_folder)
+
+    # --- DOWNLOAD INDEX (what is already saved; replaces folder scans) ---
+    index = download_index.DownloadIndex(download_index.get_index_path(save_folder))
+    if index.is_new or rebuild_index:
+        rebuild_download_index(index, category_config, links_data)
+    if rebuild_index:
+        index.close()
+        return
+    interrupted = index.journal_recover()
+    if interrupted:
+        print(f"[Journal] Resuming {interrupted} download(s) interrupted in the last run.", flush=True)
+
+    # --- CONTENT REGISTRY (what every category already has, by shortcode and SHA-256) ---
+    registry = content_registry.ContentRegistry(content_registry.get_registry_path(controller_path))
+    duplicate_policy = content_registry.get_duplicate_policy(controller_data.get("global_settings"))
+    files, hashed = registry.scan(content_registry.get_category_folders(controller_data))
+    print(f"[Registry] {files} reels on disk across categories ({hashed} newly hashed); duplicates: {duplicate_policy}.", flush=True)
+
+    # --- NORMALIZATION (verify + faststart remux of each new file; needs ffmpeg) ---
+    ffmpeg_path, ffprobe_path = video_normalize.resolve_tools(controller_data.get("global_settings"))
+    if normalize and not ffmpeg_path:
+        print("[Warn] ffmpeg not found (global_settings 'ffmpeg_path'); downloads are not verified or remuxed.", flush=True)
+    normalize = normalize and ffmpeg_path is not None
+
+    # --- THROTTLE (shared with other runs through its state file) ---
+    throttle = instagram_throttle.AdaptiveThrottle(instagram_throttle.get_state_path(controller_path))
+    cooldown = throttle.cooldown_remaining()
+    if cooldown:
+        print(f"[Throttle] Instagram cooldown from an earlier run: {cooldown:.0f}s left ({throttle.last_reason}).", flush=True)
 
     # --- LOAD SESSION ---
-    session_file = None
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    for f in os.listdir(script_dir):
-        if f.startswith("session-"):
-            session_file = os.path.join(script_dir, f)
-            print(f"[Auth] Found session file: {f}", flush=True)
-            break
-            
+    session_file = find_session_file()
     if session_file:
-        try:
-            L.load_session_from_file(os.path.basename(session_file).replace("session-", ""), session_file)
-            print("[Auth] Logged in successfully.", flush=True)
-        except Exception as e:
-            print(f"[Warn] Could not load session: {e}", flush=True)
+        print(f"[Auth] Found session file: {os.path.basename(session_file)}", flush=True)
     else:
         print("[Warn] No session file found. Running anonymously.", flush=True)
 
-    download_count = 0
-    
+    # --- HARVEST (new reels from the category's source profiles) ---
+    if harvest:
+        max_posts = max(1, category_config.get("harvest_max_posts", DEFAULT_HARVEST_MAX_POSTS))
+        new_links = harvest_links(category_name, controller_path, harvest_sources, make_loader(session_file, quiet=True),
+                                  index, links_data, max_posts, throttle)
+        links_data = {**links_data, **new_links}
+
+    def skip_by_meta(post_key, shortcode, meta):
+        """Skips photos and over-length clips (known from cached or prefetched metadata)."""
+        reason = get_meta_skip_reason(meta, max_duration)
+        if reason == download_index.JOURNAL_NOT_VIDEO:
+            print(f"[Skip] {post_key} ({shortcode}) is not a video.", flush=True)
+        elif reason == download_index.JOURNAL_TOO_LONG:
+            print(f"[Skip] {post_key} ({shortcode}) is {meta['duration']:.0f}s long (limit {max_duration}s).", flush=True)
+        if reason:
+            index.journal_update(shortcode, post_key, reason)
+        return reason is not None
+
+    # --- COLLECT JOBS ---
+    jobs = []
+    name_lock = threading.Lock()
+    linked_count = 0
     for post_key, entry in links_data.items():
         url = entry if isinstance(entry, str) else entry.get("url")
         if not url: continue
 
-        potential_base = post_key
-        if naming_scheme == "base_name":
-             m = re.match(r"(\d+)_video", post_key)
-             if m: potential_base = m.group(1)
-        
-        # Basic check for existing files
-        exists = False
-        for ext in VIDEO_EXTENSIONS:
-            if os.path.exists(os.path.join(save_folder, f"{potential_base}{ext}")):
-                exists = True
-                break
-        
-        if exists:
+        # Already saved? (index lookups, no per-extension probing)
+        shortcode = get_shortcode_from_url(url.strip())
+        if shortcode and index.has_shortcode(shortcode):
+            print(f"[Skip] {post_key} ({shortcode}) already downloaded.", flush=True)
+            continue
+        if naming_scheme != "prefix_number" and index.has_stem(get_potential_base(post_key, naming_scheme)):
             print(f"[Skip] {post_key} already exists.", flush=True)
             continue
+        journal = index.journal_status(shortcode) if shortcode else None
+        if journal and journal[0] == download_index.JOURNAL_NOT_VIDEO:
+            print(f"[Skip] {post_key} ({shortcode}) is not a video.", flush=True)
+            continue
+        meta = index.get_post_meta(shortcode) if shortcode else None
+        if meta and skip_by_meta(post_key, shortcode, meta):
+            continue
+        if journal and journal[0] == download_index.JOURNAL_DUPLICATE and duplicate_policy == "skip":
+            print(f"[Skip] {post_key} ({shortcode}): {journal[2]}.", flush=True)
+            continue
+        # Another category already has this reel?
+        existing = registry.find_shortcode(shortcode, exclude_category=category_name) if shortcode else []
+        if existing and duplicate_policy == "skip":
+            print(f"[Skip] {post_key} ({shortcode}) already in {existing[0][1]}.", flush=True)
+            index.journal_update(shortcode, post_key, download_index.JOURNAL_DUPLICATE,
+                                 f"already in {existing[0][1]}/{existing[0][2]}")
+            continue
+        if existing and duplicate_policy == "link" and link_known_duplicate(
+                registry, index, existing[0], save_folder, post_key, shortcode, category_name,
+                naming_scheme, prefix, name_lock):
+            linked_count += 1
+            continue
+        if journal and journal[0] == download_index.JOURNAL_FAILED:
+            print(f"[Retry] {post_key} failed before ({journal[1]} attempts): {journal[2]}", flush=True)
+        if shortcode and not journal:
+            index.journal_update(shortcode, post_key, download_index.JOURNAL_PENDING)
+        jobs.append((post_key, url.strip()))
+
+    if not jobs:
+        index.close()
+        registry.close()
+        print(f"\n--- Finished. New Downloads: 0, Linked: {linked_count} ---", flush=True)
+        return
 
-        if download_and_rename_media(url.strip(), post_key, L, save_folder, naming_scheme, prefix):
-            download_count += 1
+    # --- WORKER POOL (one Instaloader per thread, shared by prefetch and download) ---
+    workers = min(workers, len(jobs))
+    request_slots = threading.BoundedSemaphore(max_requests)
+    thread_state = threading.local()
+
+    def init_thread():
+        if not hasattr(thread_state, "loader"):
+            thread_state.loader = make_loader(session_file, quiet=True)
+            thread_state.http_session = make_http_session() if direct_stream else None
+
+    def prefetch(post_key, url):
+        """
+        Fetches and caches a post's metadata. Returns the Post as a JSON structure
+        (None if it failed): a Post stays bound to this thread's loader, so the
+        download worker rebuilds it on its own (load_structure).
+        """
+        init_thread()
+        shortcode = get_shortcode_from_url(url)
+        try:
+            with request_slots, throttle.request():
+                post = instaloader.Post.from_shortcode(thread_state.loader.context, shortcode)
+                meta = get_post_meta(post)
+                structure = instaloader.get_json_structure(post)
+        except Exception as e:
+            print(f"[Warn] Metadata for {post_key} not fetched ({type(e).__name__}: {e}); retrying at download.", flush=True)
+            return None
+        index.save_post_meta(shortcode, meta)
+        return structure
+
+    def worker(post_key, url, structure):
+        init_thread()
+        post = instaloader.load_structure(thread_state.loader.context, structure) if structure else None
+        ok = download_and_rename_media(url, post_key, thread_state.loader, save_folder,
+                                       naming_scheme, prefix, request_slots, name_lock, index,
+                                       thread_state.http_session, max_attempts, throttle, post)
+        if ok and normalize:
+            ok = normalize_saved_video(index, save_folder, get_shortcode_from_url(url), post_key,
+                                       ffmpeg_path, ffprobe_path)
+        if ok:
+            ok = check_saved_duplicate(registry, index, save_folder, get_shortcode_from_url(url),
+                                       post_key, category_name, duplicate_policy)
+        return ok
 
-    print(f"\n--- Finished. New Downloads: {download_count} ---", flush=True)
+    download_count = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # --- PREFETCH METADATA (all pending posts first; photos and long clips drop out here) ---
+        posts = {} # post_key -> prefetched Post as a JSON structure
+        to_fetch = [(post_key, url) for post_key, url in jobs
+                    if not index.get_post_meta(get_shortcode_from_url(url) or "")]
+        if to_fetch:
+            print(f"[Meta] Fetching metadata for {len(to_fetch)} posts...", flush=True)
+            for (post_key, url), structure in zip(to_fetch, executor.map(lambda job: prefetch(*job), to_fetch)):
+                if structure is not None:
+                    posts[post_key] = structure
+            download_jobs = []
+            for post_key, url in jobs:
+                shortcode = get_shortcode_from_url(url)
+                meta = index.get_post_meta(shortcode) if shortcode and post_key in posts else None
+                if meta and skip_by_meta(post_key, shortcode, meta):
+                    posts.pop(post_key, None)
+                    continue
+                download_jobs.append((post_key, url))
+            jobs = download_jobs
+
+        # --- DOWNLOAD ---
+        print(f"[Info] {len(jobs)} to download with {workers} workers (max {max_requests} concurrent requests).", flush=True)
+        futures = {executor.submit(worker, post_key, url, posts.pop(post_key, None)): post_key for post_key, url in jobs}
+        for done_count, future in enumerate(as_completed(futures), start=1):
+            post_key = futures[future]
+            try:
+                ok = future.result()
+            except Exception as e:
+                print(f"[Error] Worker crashed for {post_key}: {e}", flush=True)
+                ok = False
+            if ok: download_count += 1
+            print(f"[{done_count}/{len(jobs)}] {post_key}: {'OK' if ok else 'not saved'}", flush=True)
+
+    throttle.save()
+    counts = index.journal_counts()
+    print("[Journal] " + ", ".join(f"{status}: {counts[status]}" for status in sorted(counts)), flush=True)
+    if counts.get(download_index.JOURNAL_FAILED):
+        print("[Journal] Failed posts are retried on the next run.", flush=True)
+    index.close()
+    registry.close()
+
+    print(f"\n--- Finished. New Downloads: {download_count}, Linked: {linked_count} ---", flush=True)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--category", required=True)
     parser.add_argument("--controller", default="../controller/controller.json")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel downloads (default: category 'download_workers' or 4).")
+    parser.add_argument("--no-direct-stream", action="store_true", help="Always download through Instaloader's temp folder instead of streaming the video URL.")
+    parser.add_argument("--no-normalize", action="store_true", help="Skip the ffmpeg integrity check and faststart remux of new downloads.")
+    parser.add_argument("--harvest", action="store_true", help="First add new reels from the category's 'harvest_profiles' to its links.")
+    parser.add_argument("--rebuild-index", action="store_true", help="Rebuild the category's download index from the files on disk and exit.")
     args = parser.parse_args()
 
     script_dir = os.path.dirname(os.path.abspath(__file__))
     controller_abs_path = os.path.abspath(os.path.join(script_dir, args.controller))
 
-    main(args.category, controller_abs_path)
\ No newline at end of file
+    main(args.category, controller_abs_path, args.workers, args.rebuild_index, not args.no_direct_stream,
+         not args.no_normalize, args.harvest)
\ No newline at end of file
@@ -1,23 +1,228 @@
 import json
 import re
 import os
+import codecs
+import hashlib
+import time
 import argparse # To read command-line arguments
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+
+if __name__ == "__main__":
+    import controller_lock
+else:
+    try:
+        from scripts import controller_lock
+    except ImportError:
+        import controller_lock # Imported by a script run from this folder
 
 # --- REGEX PATTERNS ---
-# Simple URL extraction
-URL_PATTERN = r'https?://[^\s]+'
-# URL + Name extraction (URL on one line, Name on the next non-empty line)
-ENTRY_PATTERN = r'(https?://[^\s]+)\s+([^\n]+)'
+# URLs anywhere in a line (chat exports put them mid-sentence)
+URL_PATTERN = re.compile(r'https?://[^\s<>"\']+')
+# Punctuation that ends a sentence rather than the URL
+URL_TRAILING_CHARS = '.,;:!?)]}*'
+# Keys given to extracted links (post1, post2, ...)
+POST_KEY_PATTERN = re.compile(r'^post(\d+)$')
+# Instagram post links (/p/, /reel/, /reels/, /tv/, optionally after a username); group 1 is the shortcode.
+# The shortcode must be a whole path segment, and pages under these paths that are not posts
+# (e.g. /reels/audio/<id>/, /reels/effect/<id>/) are excluded
+NON_POST_SEGMENTS = ("audio", "effect", "effects")
+INSTAGRAM_POST_PATTERN = re.compile(
+    r'^https?://(?:[\w-]+\.)?(?:instagram\.com|instagr\.am)/(?:[\w.]+/)?(?:p|reels?|tv)/'
+    r'(?!(?:' + "|".join(NON_POST_SEGMENTS) + r')(?:[/?#]|$))([A-Za-z0-9_-]+)(?:[/?#]|$)', re.IGNORECASE)
+INSTAGRAM_HOST_PATTERN = re.compile(r'^https?://(?:[\w-]+\.)?(?:instagram\.com|instagr\.am)(?:[/?#]|$)', re.IGNORECASE)
+
+# --- Export files (link_extractor_type "html" / "json") ---
+# Text fields used as a link's name in JSON exports (from the link's own object, else the closest parent)
+CAPTION_KEYS = ("caption", "title", "name", "text", "description")
+NAME_MAX_LENGTH = 100
+# Relative links in saved Instagram pages (/reel/<code>/) are resolved against this
+INSTAGRAM_BASE_URL = "https://www.instagram.com"
+EXTRACTOR_TYPES = ("simple", "name_url", "html", "json")
+
+# --- Incremental extraction ---
+# Per category: how far into its input_txt_file has been parsed. <project>/data/link_extraction_state.json
+STATE_FILE_NAME = "link_extraction_state.json"
+# Everything before the saved offset must be unchanged (same SHA-256) to continue from it; otherwise the file is re-read
+HASH_CHUNK = 1024 * 1024
+# html exports are fed to the parser this many bytes at a time
+PARSE_CHUNK = 64 * 1024
+# A last line without a line break is only parsed once the file has not changed for this long
+# (until then it may be half-written, e.g. while an export is being saved)
+UNTERMINATED_LINE_SETTLE = 10
 
 # --- Helper Functions ---
 
-def extract_simple_links(text):
-    """Extracts only URLs."""
-    return re.findall(URL_PATTERN, text)
+def find_urls(line):
+    """URLs in one line of text, with trailing sentence punctuation removed."""
+    return [url.rstrip(URL_TRAILING_CHARS) for url in URL_PATTERN.findall(line)]
+
+def canonicalize_url(url):
+    """
+    Instagram post/reel links become https://www.instagram.com/reel/<shortcode>/
+    (tracking query strings like ?igsh= dropped); other URLs are kept as they are.
+    Returns None for an Instagram link without a shortcode (profile, explore, ...).
+    """
+    match = INSTAGRAM_POST_PATTERN.match(url)
+    if match:
+        return f"https://www.instagram.com/reel/{match.group(1)}/"
+    return None if INSTAGRAM_HOST_PATTERN.match(url) else url
+
+def iter_link_lines(f, extractor_type, stats, read_unterminated=True):
+    """
+    Streams (url, name) from an open binary file, one line at a time.
+    simple: every link on a line. name_url: a link with its name, either the
+    text after it on its line or the next non-empty line without a link (text
+    before a link, like a chat export's "[date] sender:", is not a name).
+    Updates stats: "invalid" counts lines with text but no usable link, and
+    "end" is the offset to continue from next time (a trailing name_url link
+    still waiting for its name is read again). Without `read_unterminated`, a
+    last line with no line break is left for the next run ("unterminated").
+    """
+    position = f.tell()
+    pending_url, pending_start = None, position
+    for raw_line in f:
+        if not read_unterminated and not raw_line.endswith(b"\n"):
+            stats["unterminated"] = True
+            break
+        line_start, position = position, position + len(raw_line)
+        line = raw_line.decode("utf-8", errors="replace").strip()
+        if not line:
+            continue
+        urls = find_urls(line)
+        if extractor_type == "name_url" and pending_url and not urls:
+            yield pending_url, line
+            pending_url = None
+            continue
+        if pending_url:
+            stats["invalid"] += 1 # A link without a name
+            pending_url = None
+        links = [canonicalize_url(url) for url in urls]
+        if not any(links):
+            stats["invalid"] += 1
+            continue
+        if extractor_type == "simple":
+            for link in filter(None, links):
+                yield link, None
+            continue
+        link = next(filter(None, links))
+        name = URL_PATTERN.split(line)[-1].strip(" -|:\t")
+        if name:
+            yield link, name
+        else:
+            pending_url, pending_start = link, line_start
+    stats["end"] = pending_start if pending_url else position
+
+def clean_name(text):
+    """Caption text usable as a name: URLs removed, whitespace collapsed, shortened. None if nothing is left."""
+    if not isinstance(text, str):
+        return None
+    name = " ".join(URL_PATTERN.sub(" ", text).split()).strip(" -|:")
+    if len(name) > NAME_MAX_LENGTH:
+        name = name[:NAME_MAX_LENGTH].rsplit(" ", 1)[0] + "..."
+    return name or None
+
+class AnchorParser(HTMLParser):
+    """Collects <a href> tags as (href, text, title, aria-label, alt of the first <img> inside) in `anchors`."""
+
+    def __init__(self):
+        super().__init__()
+        self.anchors = []
+        self._open = None # The <a> being read: [href, text parts, title, aria-label, image alt]
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            self._finish() # <a> can't nest; an unclosed one ends here
+            attrs = dict(attrs)
+            if attrs.get("href"):
+                self._open = [attrs["href"], [], attrs.get("title"), attrs.get("aria-label"), None]
+        elif self._open:
+            self._open[1].append(" ") # Text in separate tags stays separate words
+            if tag == "img" and self._open[4] is None:
+                self._open[4] = dict(attrs).get("alt")
 
-def extract_name_url_entries(text):
-    """Extracts (URL, Name) tuples."""
-    return re.findall(ENTRY_PATTERN, text)
+    def handle_endtag(self, tag):
+        if tag == "a":
+            self._finish()
+        elif self._open:
+            self._open[1].append(" ")
+
+    def handle_data(self, data):
+        if self._open:
+            self._open[1].append(data)
+
+    def close(self):
+        super().close()
+        self._finish()
+
+    def _finish(self):
+        if self._open:
+            href, text, title, label, alt = self._open
+            self.anchors.append((href, "".join(text), title, label, alt))
+            self._open = None
+
+def iter_html_links(f, stats):
+    """
+    Streams (reel url, name) from an HTML export (saved-collection page, chat
+    export, bookmarks file), feeding it to the parser PARSE_CHUNK bytes at a
+    time. Only <a> tags are kept; the name comes from the link text, its
+    title/aria-label or the alt text of an image inside it.
+    """
+    parser = AnchorParser()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        chunk = f.read(PARSE_CHUNK)
+        parser.feed(decoder.decode(chunk, final=not chunk))
+        if not chunk:
+            parser.close()
+        anchors, parser.anchors = parser.anchors, []
+        for href, text, title, label, alt in anchors:
+            href = href.strip()
+            if href.startswith("/"):
+                href = INSTAGRAM_BASE_URL + href
+            link = canonicalize_url(href)
+            if link is None:
+                stats["invalid"] += 1
+            if not link or not INSTAGRAM_POST_PATTERN.match(link):
+                continue # Not a reel (other sites are common in bookmarks)
+            yield link, clean_name(text) or clean_name(title) or clean_name(label) or clean_name(alt)
+        if not chunk:
+            break
+
+def iter_json_links(f, stats):
+    """
+    Streams (reel url, name) from a JSON export (chat export, browser bookmarks,
+    Instagram data download), walking it with a stack instead of recursion.
+    Any string may hold links; the name is the rest of that string or the
+    closest caption/title/name/text field around it. The whole document is
+    decoded at once (a caption can follow its link within an object), so
+    memory grows with the export's size; split very large exports.
+    """
+    stack = [(json.load(f), None)]
+    while stack:
+        value, name = stack.pop()
+        if isinstance(value, dict):
+            name = next(filter(None, (clean_name(value.get(key)) for key in CAPTION_KEYS)), name)
+            stack.extend((child, name) for child in reversed(list(value.values())))
+        elif isinstance(value, list):
+            stack.extend((child, name) for child in reversed(value))
+        elif isinstance(value, str) and "http" in value:
+            for url in find_urls(value):
+                link = canonicalize_url(url)
+                if link is None:
+                    stats["invalid"] += 1
+                elif INSTAGRAM_POST_PATTERN.match(link):
+                    yield link, clean_name(value) or name
+
+def get_link_id(url):
+    """Identity of a link for de-duplication: the Instagram shortcode, else the URL without query/fragment."""
+    match = INSTAGRAM_POST_PATTERN.match(url)
+    if match:
+        return match.group(1)
+    return re.split(r'[?#]', url, maxsplit=1)[0].rstrip('/').lower()
+
+def get_entry_url(entry):
+    return entry if isinstance(entry, str) else (entry or {}).get("url") or ""
 
 def load_json(file_path):
     """Loads JSON data from a file."""
@@ -35,20 +240,186 @@ def load_json(file_path):
         return None
 
 def save_json(data, file_path):
-    """Saves data to a JSON file."""
+    """Saves data to a JSON file (written to a temp file first, so a crash never leaves it half-written)."""
     try:
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        controller_lock.write_json_atomic(data, file_path)
         return True
     except Exception as e:
         print(f"[Error] Could not write file {file_path}: {e}", flush=True)
         return False
 
+def get_state_path(controller_path):
+    """Extraction state file for a controller.json (in the project's data folder)."""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(controller_path)))
+    return os.path.join(project_root, "data", STATE_FILE_NAME)
+
+def load_state(state_path):
+    if not os.path.exists(state_path):
+        return {}
+    return load_json(state_path) or {}
+
+def save_state(state, state_path):
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    return save_json(state, state_path)
+
+def hash_prefix(f, end, digest=None, start=0):
+    """
+    Feeds bytes [start, end) of f to `digest` (a new SHA-256 if None) in HASH_CHUNK
+    reads and returns it. Pass the digest of [0, start) to extend it to [0, end).
+    """
+    digest = digest or hashlib.sha256()
+    f.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = f.read(min(HASH_CHUNK, remaining))
+        if not chunk:
+            break
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest
+
+def get_start_offset(f, input_txt_file, saved):
+    """
+    (offset, digest of everything before it) to continue from if the file only grew
+    since the last run (0 if it was empty then); (None, None) (start over) if any of
+    the parsed part was edited or truncated, or it is another file.
+    """
+    size = os.fstat(f.fileno()).st_size
+    offset = saved.get("offset")
+    if saved.get("file") == os.path.abspath(input_txt_file) and offset is not None and 0 <= offset <= size:
+        digest = hash_prefix(f, offset)
+        if digest.hexdigest() == saved.get("sha256"):
+            return offset, digest
+    return None, None
+
+# --- Extraction ---
+
+def extract_category(category_name, category_config, existing_links, saved_state):
+    """
+    Parses what was appended to a category's input_txt_file since the last run
+    (html/json exports: the whole file, if it changed). Links already in `existing_links` (same shortcode) are skipped; new ones get
+    the next free post<N> keys, so existing keys (and the files named after them)
+    never shift. Returns (new_links, new_state), or None on error.
+    """
+    input_txt_file = category_config.get("input_txt_file")
+    extractor_type = category_config.get("link_extractor_type")
+    if extractor_type not in EXTRACTOR_TYPES:
+        if extractor_type:
+            print(f"[Error] Unknown 'link_extractor_type': {extractor_type}", flush=True)
+        else:
+            print(f"[Error] 'link_extractor_type' not configured for '{category_name}'.", flush=True)
+        return None
+    if not os.path.exists(input_txt_file):
+        print(f"[Error] Input text file not found: {input_txt_file}", flush=True)
+        return None
+    known = {get_link_id(get_entry_url(entry)) for entry in existing_links.values()}
+    next_number = max([int(m.group(1)) for m in map(POST_KEY_PATTERN.match, existing_links) if m], default=0) + 1
+    new_links = {}
+    stats = {"kept": 0, "duplicate": 0, "invalid": 0}
+    try:
+        with open(input_txt_file, "rb") as f:
+            file_stat = os.fstat(f.fileno())
+            size = file_stat.st_size
+            start, digest = get_start_offset(f, input_txt_file, saved_state or {})
+            if extractor_type in ("html", "json") and start is not None:
+                # Exports are rewritten as a whole: unchanged means nothing to do, otherwise parse all of it
+                if start == size:
+                    print(f"[Info] {os.path.basename(input_txt_file)} unchanged since the last run.", flush=True)
+                    return new_links, saved_state
+                start, digest = None, None
+            if start:
+                print(f"[Info] Continuing {os.path.basename(input_txt_file)} from byte {start}.", flush=True)
+            elif start is None and saved_state:
+                print(f"[Info] {os.path.basename(input_txt_file)} changed since the last run; re-reading it (existing keys are kept).", flush=True)
+            f.seek(start or 0)
+            if extractor_type == "html":
+                entries = iter_html_links(f, stats)
+            elif extractor_type == "json":
+                entries = iter_json_links(f, stats)
+            else:
+                settled = time.time() - file_stat.st_mtime >= UNTERMINATED_LINE_SETTLE
+                entries = iter_link_lines(f, extractor_type, stats, read_unterminated=settled)
+            for url, name in entries:
+                link_id = get_link_id(url)
+                if link_id in known:
+                    stats["duplicate"] += 1
+                    continue
+                known.add(link_id)
+                stats["kept"] += 1
+                new_links[f"post{next_number}"] = {"url": url, "name": name} if name else url
+                next_number += 1
+            end = stats.get("end", size)
+            # The prefix digest from the check is extended over the newly parsed bytes only
+            digest = hash_prefix(f, end, digest, start or 0)
+            new_state = {"file": os.path.abspath(input_txt_file), "offset": end, "sha256": digest.hexdigest()}
+    except Exception as e:
+        print(f"[Error] Could not read input file {input_txt_file}: {e}", flush=True)
+        return None
+
+    print(f"[Info] {os.path.basename(input_txt_file)}: {stats['kept']} kept, {stats['duplicate']} duplicates, "
+          f"{stats['invalid']} invalid.", flush=True)
+    if stats.get("unterminated"):
+        print(f"[Info] The last line of {os.path.basename(input_txt_file)} is still being written; it is read on the next run.", flush=True)
+    if not stats["kept"] and not existing_links:
+        print(f"[Warning] No valid links found in {input_txt_file}", flush=True)
+    return new_links, new_state
+
+# --- Saving ---
+
+def merge_links(current_links, new_links):
+    """
+    Adds new links to a category's current json_data. Links another run added
+    meanwhile are not added twice; a post<N> key taken meanwhile moves to the next free number.
+    """
+    merged = dict(current_links)
+    known = {get_link_id(get_entry_url(entry)) for entry in merged.values()}
+    next_number = max([int(m.group(1)) for m in map(POST_KEY_PATTERN.match, merged) if m], default=0) + 1
+    added = 0
+    for post_key, entry in new_links.items():
+        link_id = get_link_id(get_entry_url(entry))
+        if link_id in known:
+            continue
+        if post_key in merged:
+            post_key, next_number = f"post{next_number}", next_number + 1
+        merged[post_key] = entry
+        known.add(link_id)
+        added += 1
+    return merged, added
+
+def commit_results(controller_path, results):
+    """
+    Saves {category: (new_links, new_state)} with one write of controller.json:
+    under the lock, the file is re-read so changes made since it was loaded are
+    kept, the new links are merged in and the file is atomically replaced.
+    Returns {category: links added}, or None if nothing could be saved.
+    """
+    state_path = get_state_path(controller_path)
+    try:
+        with controller_lock.ControllerLock(controller_path):
+            controller_data = load_json(controller_path)
+            if not controller_data:
+                return None
+            json_data = controller_data.setdefault("json_data", {})
+            added = {}
+            for category_name, (new_links, _) in results.items():
+                json_data[category_name], added[category_name] = merge_links(json_data.get(category_name) or {}, new_links)
+            if any(added.values()) and not save_json(controller_data, controller_path):
+                return None
+            # Remember how far each file was parsed (only after the links are saved)
+            state = load_state(state_path)
+            state.update({category_name: new_state for category_name, (_, new_state) in results.items()})
+            save_state(state, state_path)
+            return added
+    except TimeoutError as e:
+        print(f"[Error] {e}; nothing saved.", flush=True)
+        return None
+
 # --- Main Logic ---
 
-def main(category_name, controller_path):
+def main(category_name, controller_path, dry_run=False):
     """
     Extracts links for a specific category based on controller configuration.
+    With dry_run, the links this run would add are only printed (nothing is saved).
     """
     print(f"--- Starting Link Extraction for Category: {category_name} ---", flush=True)
 
@@ -63,76 +434,91 @@ def main(category_name, controller_path):
         return
 
     # 2. Get settings from config
-    input_txt_file = category_config.get("input_txt_file")
-    extractor_type = category_config.get("link_extractor_type")
-
-    if not input_txt_file:
+    if not category_config.get("input_txt_file"):
         print(f"[Info] No input_txt_file configured for '{category_name}'. Skipping extraction.", flush=True)
         return # Not an error if the category doesn't use link extraction (like Quotes)
 
-    if not extractor_type:
-        print(f"[Error] 'link_extractor_type' not configured for '{category_name}'.", flush=True)
+    # 3. Parse only what was added since the last run
+    state = load_state(get_state_path(controller_path))
+    existing_links = controller_data.get("json_data", {}).get(category_name) or {}
+    result = extract_category(category_name, category_config, existing_links, state.get(category_name))
+    if result is None:
         return
-
-    # 3. Read the input text file
-    if not os.path.exists(input_txt_file):
-        print(f"[Error] Input text file not found: {input_txt_file}", flush=True)
+    if dry_run:
+        for post_key, entry in result[0].items():
+            print(f"[Dry Run] {post_key}: {get_entry_url(entry)}" + (f" | {entry['name']}" if isinstance(entry, dict) else ""), flush=True)
+        print(f"--- Dry run: {len(result[0])} new items, nothing saved ---", flush=True)
         return
-    try:
-        with open(input_txt_file, "r", encoding="utf-8") as f:
-            content = f.read()
-    except Exception as e:
-        print(f"[Error] Could not read input file {input_txt_file}: {e}", flush=True)
+
+    # 4. Add the new links to controller.json (existing keys are kept)
+    added = commit_results(controller_path, {category_name: result})
+    if added is None:
+        print("[Error] Failed to save updated controller data.", flush=True)
         return
+    print(f"[Success] {added[category_name]} new items extracted for '{category_name}'.", flush=True)
 
-    # 4. Extract data based on type
-    extracted_data = {}
-    items_found = 0
+    print(f"--- Finished Link Extraction for {category_name} ---", flush=True)
 
-    if extractor_type == "simple":
-        urls = extract_simple_links(content)
-        if not urls:
-            print(f"[Warning] No valid links found in {input_txt_file}", flush=True)
-        else:
-            extracted_data = {f"post{i+1}": url for i, url in enumerate(urls)}
-            items_found = len(urls)
-    elif extractor_type == "name_url":
-        entries = extract_name_url_entries(content)
-        if not entries:
-            print(f"[Warning] No valid entries (link + name) found in {input_txt_file}", flush=True)
-        else:
-            extracted_data = {f"post{i+1}": {"url": url, "name": name.strip()} for i, (url, name) in enumerate(entries)}
-            items_found = len(entries)
-    else:
-        print(f"[Error] Unknown 'link_extractor_type': {extractor_type}", flush=True)
+def main_all(controller_path, workers=None):
+    """
+    Extracts every category with an input_txt_file and a link_extractor_type in
+    one process: the files are parsed in parallel and all results are saved
+    with a single write.
+    """
+    print("--- Starting Link Extraction for All Categories ---", flush=True)
+    controller_data = load_json(controller_path)
+    if not controller_data:
+        return
+
+    # Categories without a link_extractor_type (like Quotes) don't use link extraction
+    categories = {name: config for name, config in controller_data.get("categories", {}).items()
+                  if config.get("input_txt_file") and config.get("link_extractor_type")}
+    if not categories:
+        print("[Info] No category has an input_txt_file and a link_extractor_type.", flush=True)
         return
+    state = load_state(get_state_path(controller_path))
+    json_data = controller_data.get("json_data", {})
 
-    # 5. Update controller.json
-    if "json_data" not in controller_data:
-        controller_data["json_data"] = {} # Ensure the section exists
+    def extract(category_name):
+        return extract_category(category_name, categories[category_name],
+                                json_data.get(category_name) or {}, state.get(category_name))
 
-    # Overwrite the specific category's data
-    controller_data["json_data"][category_name] = extracted_data
+    with ThreadPoolExecutor(max_workers=workers or len(categories)) as executor:
+        results = dict(zip(categories, executor.map(extract, categories)))
+    failed = [name for name, result in results.items() if result is None]
+    results = {name: result for name, result in results.items() if result is not None}
 
-    # 6. Save the updated controller file
-    if save_json(controller_data, controller_path):
-        print(f"[Success] {items_found} items extracted and saved to controller for '{category_name}'.", flush=True)
-    else:
-        print(f"[Error] Failed to save updated controller data.", flush=True)
+    added = commit_results(controller_path, results) if results else {}
+    if added is None:
+        print("[Error] Failed to save updated controller data.", flush=True)
+        return
+    for category_name, count in added.items():
+        print(f"[Success] {category_name}: {count} new items.", flush=True)
+    for category_name in failed:
+        print(f"[Error] {category_name}: extraction failed (see above).", flush=True)
 
-    print(f"--- Finished Link Extraction for {category_name} ---", flush=True)
+    print(f"--- Finished Link Extraction: {len(added)} categories, {sum(added.values())} new items ---", flush=True)
 
 # --- Command-Line Argument Parsing ---
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extract links from a text file and update the controller JSON.")
-    parser.add_argument("--category", required=True, help="The category name (e.g., 'Anime', 'Cars') as defined in controller.json.")
+    parser.add_argument("--category", help="The category name (e.g., 'Anime', 'Cars') as defined in controller.json.")
+    parser.add_argument("--all", action="store_true", help="Extract every category with an input_txt_file in one run.")
     parser.add_argument("--controller", default="../controller/controller.json", help="Path to the main controller JSON file.") # Default relative path
+    parser.add_argument("--dry-run", action="store_true", help="With --category: print the links that would be added, save nothing.")
 
     args = parser.parse_args()
+    if not args.category and not args.all:
+        parser.error("--category or --all is required")
+    if args.dry_run and args.all:
+        parser.error("--dry-run works with --category only")
 
     # Make controller path absolute relative to this script's location
     script_dir = os.path.dirname(os.path.abspath(__file__))
     controller_abs_path = os.path.abspath(os.path.join(script_dir, args.controller))
 
-    main(args.category, controller_abs_path)
\ No newline at end of file
+    if args.all:
+        main_all(controller_abs_path)
+    else:
+        main(args.category, controller_abs_path, args.dry_run)
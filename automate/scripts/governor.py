@@ -0,0 +1,202 @@
+import sys
+import os
+import ctypes
+import platform
+import subprocess
+
+# --- Constants ---
+# Heavy job kinds and a rough memory estimate for each (MB), used for admission
+JOB_MEMORY_MB = {
+    "render": 600,    # ffmpeg libx264 encode(s)
+    "browser": 1000,  # Selenium Chrome upload
+    "download": 300,  # Instagram downloads
+}
+# Controller tasks that count as heavy, by script file name
+HEAVY_TASK_SCRIPTS = {
+    "create_videos.py": "render",
+    "upload_to_youtube.py": "browser", # Uploads through Selenium (upload_selenium)
+    "download_reels.py": "download",
+}
+# Modes of heavy scripts that run light, by argument (a flag, or a flag and its value)
+LIGHT_TASK_ARGS = {
+    # Long-running watcher: each render takes an encode slot (acquire_encode_slot)
+    "create_videos.py": [("--watch",)],
+    # YouTube API uploads start no browser
+    "upload_to_youtube.py": [("--upload-mode", "api_only")],
+}
+# Defaults for the controller.json global_settings keys
+DEFAULT_LIMITS = {
+    "governor_max_heavy_jobs": 2,       # Heavy jobs running at once
+    "governor_max_load_per_cpu": 0.9,   # 1-minute load average per CPU
+    "governor_min_free_memory_mb": 512, # Free memory to keep after a job's estimate
+}
+# Seconds between repeated "waiting" messages
+REPORT_INTERVAL_SECONDS = 30
+# Lower priority for heavy jobs: nice value, and I/O best-effort class at lowest level
+LOW_PRIORITY_NICE = 10
+IOPRIO_CLASS_BE = 2
+IOPRIO_LOWEST_LEVEL = 7
+IOPRIO_WHO_PROCESS = 1
+# ioprio_set syscall numbers (no libc wrapper)
+IOPRIO_SET_SYSCALLS = {"x86_64": 251, "amd64": 251, "aarch64": 30, "arm64": 30, "i386": 289, "i686": 289, "armv7l": 314}
+# Windows
+BELOW_NORMAL_PRIORITY_CLASS = 0x00004000
+PROCESS_SET_INFORMATION = 0x0200
+
+# --- System Readings ---
+
+def get_cpu_count():
+    """CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+def read_load_average():
+    """1-minute load average from /proc/loadavg (or getloadavg), or None on Windows."""
+    try:
+        with open("/proc/loadavg", "r") as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+
+def read_available_memory_mb():
+    """MemAvailable from /proc/meminfo in MB, or None if it can't be read."""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    if sys.platform == "win32":
+        return _read_windows_available_memory_mb()
+    return None
+
+def _read_windows_available_memory_mb():
+    class MEMORYSTATUSEX(ctypes.Structure):
+        _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                    ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                    ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                    ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                    ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+    try:
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys // (1024 * 1024)
+    except Exception:
+        pass
+    return None
+
+# --- Admission ---
+
+def get_limits(settings=None):
+    """Governor limits from controller.json global_settings, falling back to defaults."""
+    settings = settings or {}
+    return {key: settings.get(key, default) for key, default in DEFAULT_LIMITS.items()}
+
+def has_args(script_args, pattern):
+    """True if `pattern` (flag[, value]) is in the argument list, also as --flag=value."""
+    script_args = [str(arg) for arg in script_args or []]
+    joined = "=".join(pattern)
+    return joined in script_args or any(tuple(script_args[i:i + len(pattern)]) == tuple(pattern)
+                                        for i in range(len(script_args)))
+
+def get_task_kind(script_path, script_args=None):
+    """Heavy job kind for a controller task script (and its args), or None for light tasks."""
+    script_name = os.path.basename(script_path or "")
+    if any(has_args(script_args, pattern) for pattern in LIGHT_TASK_ARGS.get(script_name, [])):
+        return None
+    return HEAVY_TASK_SCRIPTS.get(script_name)
+
+def check_capacity(kind, running_heavy=0, limits=None):
+    """
+    Decides whether a heavy job of `kind` may start now.
+    Returns (admitted, reason); the reason says what it is waiting for.
+    """
+    limits = limits or get_limits()
+    if running_heavy >= limits["governor_max_heavy_jobs"]:
+        return False, f"{running_heavy} heavy jobs running (limit {limits['governor_max_heavy_jobs']})"
+
+    cpu_count = get_cpu_count()
+    load = read_load_average()
+    if load is not None and load / cpu_count >= limits["governor_max_load_per_cpu"]:
+        return False, (f"load {load:.2f} on {cpu_count} CPUs "
+                       f"(limit {limits['governor_max_load_per_cpu']:g} per CPU)")
+
+    available_mb = read_available_memory_mb()
+    needed_mb = JOB_MEMORY_MB.get(kind, 0) + limits["governor_min_free_memory_mb"]
+    if available_mb is not None and available_mb < needed_mb:
+        return False, f"{available_mb} MB memory free, {kind} needs {needed_mb} MB"
+    return True, ""
+
+# --- Process Priority ---
+
+def get_popen_priority_kwargs():
+    """Popen kwargs that start a process at lower priority (Windows; POSIX uses lower_process_priority)."""
+    if sys.platform == "win32":
+        return {"creationflags": getattr(subprocess, "BELOW_NORMAL_PRIORITY_CLASS", BELOW_NORMAL_PRIORITY_CLASS)}
+    return {}
+
+def _set_io_priority(pid):
+    syscall_number = IOPRIO_SET_SYSCALLS.get(platform.machine().lower())
+    if not syscall_number:
+        return False
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        value = (IOPRIO_CLASS_BE << 13) | IOPRIO_LOWEST_LEVEL
+        return libc.syscall(syscall_number, IOPRIO_WHO_PROCESS, pid, value) == 0
+    except (OSError, AttributeError):
+        return False
+
+def _list_child_pids(pid):
+    """Direct children of a process (Linux /proc), used to reach a browser's helpers."""
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children", "r") as f:
+                children.extend(int(child) for child in f.read().split())
+    except (OSError, ValueError):
+        pass
+    return children
+
+def lower_process_priority(pid, include_children=False):
+    """
+    Lowers CPU (nice) and I/O priority of a running process; processes it
+    starts afterwards inherit it. Best effort: returns False if nothing changed.
+    """
+    if sys.platform == "win32":
+        try:
+            kernel32 = ctypes.windll.kernel32
+            handle = kernel32.OpenProcess(PROCESS_SET_INFORMATION, False, pid)
+            if not handle:
+                return False
+            try:
+                return bool(kernel32.SetPriorityClass(handle, BELOW_NORMAL_PRIORITY_CLASS))
+            finally:
+                kernel32.CloseHandle(handle)
+        except Exception:
+            return False
+
+    pids = [pid]
+    if include_children:
+        index = 0
+        while index < len(pids):
+            pids.extend(_list_child_pids(pids[index]))
+            index += 1
+
+    changed = False
+    for target in pids:
+        try:
+            if os.getpriority(os.PRIO_PROCESS, target) < LOW_PRIORITY_NICE:
+                os.setpriority(os.PRIO_PROCESS, target, LOW_PRIORITY_NICE)
+            changed = True
+        except (OSError, AttributeError):
+            continue
+        _set_io_priority(target)
+    return changed
@@ -0,0 +1,208 @@
+import os
+import re
+import json
+import time
+import random
+import datetime
+import threading
+import contextlib
+
+try:
+    import instaloader
+    INSTALOADER_AVAILABLE = True
+except ImportError:
+    INSTALOADER_AVAILABLE = False
+
+# --- Constants ---
+# Shared by every download run: <project>/data/instagram_throttle.json
+STATE_FILE_NAME = "instagram_throttle.json"
+# Gap between Instagram requests (seconds): shrinks a little per success, jumps per block
+MIN_INTERVAL = 1.0
+START_INTERVAL = 3.0
+MAX_INTERVAL = 60.0
+SPEEDUP_FACTOR = 0.9
+SLOWDOWN_FACTOR = 4
+# Pause after a block: doubles for each block in a row (2 minutes, 4, 8, ... at most 30)
+BASE_COOLDOWN = 120
+MAX_COOLDOWN = 1800
+# Longest single sleep while cooling down, so a cooldown extended by another run is noticed
+COOLDOWN_POLL_SECONDS = 30
+# Responses that mean Instagram wants us to slow down
+RATE_LIMIT_STATUS_CODES = {401, 429}
+# Instaloader puts the status in its messages as "<code> <reason>" (e.g. "401 Unauthorized - ... Please wait a few minutes")
+RATE_LIMIT_PATTERN = re.compile(r"\b(?:401 Unauthorized|429 Too Many Requests)\b|please wait (?:a few minutes|some time)", re.IGNORECASE)
+
+def get_state_path(controller_path):
+    """Throttle state file for a controller.json (in the project's data folder)."""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(controller_path)))
+    return os.path.join(project_root, "data", STATE_FILE_NAME)
+
+def is_rate_limit_error(error):
+    """
+    True for 429/401 and "please wait" failures: the HTTP status of a requests
+    error, or Instaloader's exception type and its status message. Other errors
+    (and numbers elsewhere in a message) never count.
+    """
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) in RATE_LIMIT_STATUS_CODES:
+        return True
+    if not INSTALOADER_AVAILABLE:
+        return False
+    if isinstance(error, instaloader.exceptions.TooManyRequestsException):
+        return True
+    if isinstance(error, (instaloader.exceptions.InstaloaderException, instaloader.exceptions.AbortDownloadException)):
+        return bool(RATE_LIMIT_PATTERN.search(str(error)))
+    return False
+
+class AdaptiveThrottle:
+    """
+    Paces Instagram requests for all worker threads of a run. The gap between
+    requests shrinks while they succeed and grows sharply when Instagram
+    rate-limits; a block also starts a cooldown that is saved to `state_path`,
+    so later runs (and other categories running now) wait it out too.
+    """
+
+    def __init__(self, state_path=None):
+        self.state_path = state_path
+        self.interval = START_INTERVAL
+        self.cooldown_until = 0.0 # Epoch seconds
+        self.consecutive_blocks = 0
+        self.last_reason = None
+        self._lock = threading.Lock()
+        self._next_start = 0.0 # time.monotonic() of the next free request slot
+        self._state_mtime = None
+        self._reported_cooldown = None
+        state = self._read_state()
+        if state:
+            self.interval = min(MAX_INTERVAL, max(MIN_INTERVAL, float(state.get("interval", START_INTERVAL))))
+            self._merge_state(state)
+
+    # --- State File ---
+
+    def _read_state(self):
+        if not self.state_path:
+            return None
+        try:
+            mtime = os.path.getmtime(self.state_path)
+            if mtime == self._state_mtime:
+                return None
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self._state_mtime = mtime
+            return state if isinstance(state, dict) else None
+        except (OSError, ValueError):
+            return None
+
+    def _merge_state(self, state):
+        """Takes the stricter of our and another run's cooldown."""
+        cooldown_until = float(state.get("cooldown_until", 0))
+        if cooldown_until > self.cooldown_until:
+            self.cooldown_until = cooldown_until
+            self.consecutive_blocks = max(self.consecutive_blocks, int(state.get("consecutive_blocks", 0)))
+            self.last_reason = state.get("reason")
+
+    def _write_state(self):
+        if not self.state_path:
+            return
+        state = self._read_state()
+        if state:
+            self._merge_state(state)
+        data = {
+            "cooldown_until": self.cooldown_until,
+            "cooldown_until_text": datetime.datetime.fromtimestamp(self.cooldown_until).isoformat(timespec="seconds")
+                                   if self.cooldown_until else None,
+            "consecutive_blocks": self.consecutive_blocks,
+            "interval": round(self.interval, 2),
+            "reason": self.last_reason,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            temp_path = f"{self.state_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.state_path)
+            self._state_mtime = os.path.getmtime(self.state_path)
+        except OSError as e:
+            print(f"[Warn] Could not save throttle state: {e}", flush=True)
+
+    def save(self):
+        """Stores the learned pace for the next run."""
+        with self._lock:
+            self._write_state()
+
+    # --- Pacing ---
+
+    def cooldown_remaining(self):
+        with self._lock:
+            state = self._read_state()
+            if state:
+                self._merge_state(state)
+            return max(0.0, self.cooldown_until - time.time())
+
+    def wait(self, paced=True):
+        """
+        Blocks until a request may start: first any cooldown, then (if `paced`)
+        the current gap since the previous request.
+        """
+        reserved = False
+        while True:
+            with self._lock:
+                state = self._read_state()
+                if state:
+                    self._merge_state(state)
+                cooldown = self.cooldown_until - time.time()
+                if cooldown > 0:
+                    if self._reported_cooldown != self.cooldown_until:
+                        self._reported_cooldown = self.cooldown_until
+                        print(f"[Throttle] Instagram cooldown: waiting {cooldown:.0f}s ({self.last_reason}).", flush=True)
+                    delay = min(cooldown, COOLDOWN_POLL_SECONDS)
+                    reserved = False
+                elif reserved or not paced:
+                    return
+                else:
+                    now = time.monotonic()
+                    start = max(now, self._next_start)
+                    self._next_start = start + self.interval * random.uniform(0.8, 1.2)
+                    delay = start - now
+                    if delay <= 0:
+                        return
+                    reserved = True
+            time.sleep(delay)
+
+    def record_success(self):
+        with self._lock:
+            self.interval = max(MIN_INTERVAL, self.interval * SPEEDUP_FACTOR)
+            if self.consecutive_blocks:
+                self.consecutive_blocks = 0
+                self._write_state()
+
+    def record_block(self, reason):
+        """Slows down after a rate-limit response and starts (or extends) the shared cooldown."""
+        with self._lock:
+            state = self._read_state()
+            if state:
+                self._merge_state(state)
+            now = time.time()
+            if self.cooldown_until > now:
+                return # Requests already in flight when the block started
+            self.consecutive_blocks += 1
+            cooldown = min(MAX_COOLDOWN, BASE_COOLDOWN * 2 ** (self.consecutive_blocks - 1))
+            self.cooldown_until = now + cooldown
+            self.interval = min(MAX_INTERVAL, self.interval * SLOWDOWN_FACTOR)
+            self.last_reason = reason[:200]
+            self._write_state()
+            print(f"[Throttle] Rate limited ({self.last_reason}). Pausing Instagram requests for {cooldown}s, "
+                  f"then one every ~{self.interval:.0f}s.", flush=True)
+
+    @contextlib.contextmanager
+    def request(self, paced=True):
+        """Wraps one Instagram call: waits its turn, then records success or a rate-limit block."""
+        self.wait(paced)
+        try:
+            yield
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self.record_block(f"{type(e).__name__}: {e}")
+            raise
+        else:
+            self.record_success()
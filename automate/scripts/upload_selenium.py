@@ -10,6 +10,11 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
 
+try:
+    from scripts import governor
+except ImportError:
+    import governor # Imported by a sibling script run from this folder
+
 # --- Configuration ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 PROFILES_DIR = os.path.join(BASE_DIR, "data", "browser_profiles")
@@ -49,6 +54,9 @@ def upload_video(category, video_path, title, description, tags, privacy="privat
     driver = None
     try:
         driver = uc.Chrome(options=options, version_main=None)
+        # Keep Chrome from starving renders and the dashboard (resource governor)
+        if getattr(driver, "browser_pid", None):
+            governor.lower_process_priority(driver.browser_pid, include_children=True)
         
         # 1. Upload Page
         print("   Opening YouTube Studio...")
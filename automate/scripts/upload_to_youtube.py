@@ -12,9 +12,11 @@ try:
     if __name__ == "__main__":
         import upload_selenium
         import utils
+        import governor
     else:
         from scripts import upload_selenium
         from scripts import utils
+        from scripts import governor
     SELENIUM_AVAILABLE = True
 except ImportError:
     print("[Warning] Dependencies not found. Hybrid mode issues.", flush=True)
@@ -59,6 +61,15 @@ def generate_fallback_details(name, url, default_title, default_desc, default_ta
     if url: final_desc += f"\n\nSource: {url}"
     return {"title": final_title, "description": final_desc, "tags": default_tags[:50]}
 
+def get_title_from_caption(caption, max_length=80):
+    """Short title from an Instagram caption: its first line without hashtags or mentions."""
+    if not caption: return None
+    first_line = next((line.strip() for line in caption.splitlines() if line.strip()), "")
+    text = re.sub(r"\s+", " ", re.sub(r"[#@][\w.]+", "", first_line)).strip(" -|:")
+    if len(text) > max_length:
+        text = text[:max_length].rsplit(" ", 1)[0]
+    return text or None
+
 # --- Upload Wrappers ---
 
 def run_selenium_upload(category, video_path, title, desc, tags, privacy="private", is_kids=False, schedule_dt=None):
@@ -126,9 +137,10 @@ def run_api_upload(client_secrets, token_file, video_path, title, desc, tags, ca
         return False
 
 # --- FLASK EXECUTION FUNCTION ---
-def upload_single_video_from_flask(category_name, video_filename, form_data, controller_path):
+def upload_single_video_from_flask(category_name, video_filename, form_data, controller_path, running_heavy=0):
     """
     Called by the Flask app to execute the upload based on User Review.
+    `running_heavy` is the number of heavy controller tasks running (resource governor).
     """
     print(f"--- Manual Upload Execution: {video_filename} ---", flush=True)
     
@@ -161,6 +173,15 @@ def upload_single_video_from_flask(category_name, video_filename, form_data, con
                 schedule_dt = datetime.datetime.strptime(schedule_input, "%Y-%m-%dT%H:%M")
             except: pass
 
+    # A Chrome instance is heavy: if the host has no room, say so right away
+    # (never block the request, and never spend API quota just because it is busy)
+    if SELENIUM_AVAILABLE and not enable_schedule and mode != "api_only":
+        limits = governor.get_limits(controller_data.get("global_settings", {}))
+        admitted, reason = governor.check_capacity("browser", running_heavy, limits)
+        if not admitted:
+            print(f"   [Governor] Host too busy for a browser upload ({reason}).", flush=True)
+            return False, f"Host busy ({reason}). Try again in a few minutes."
+
     success = False
     
     # --- LOGIC BRANCHING ---
@@ -228,8 +249,16 @@ def upload_single_video_from_flask(category_name, video_filename, form_data, con
             
     return False, "Upload Failed."
 
-def main(category_name, controller_path):
+def main(category_name, controller_path, upload_mode="hybrid"):
     print("This script is now optimized for the Web Dashboard.")
 
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="YouTube uploads (run from the web dashboard's review page).")
+    parser.add_argument("--category", default=None)
+    parser.add_argument("--controller", default="../controller/controller.json")
+    # api_only never starts a browser, so the controller runs it as a light task (governor)
+    parser.add_argument("--upload-mode", choices=["hybrid", "selenium_only", "api_only"], default="hybrid")
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    main(args.category, os.path.abspath(os.path.join(script_dir, args.controller)), args.upload_mode)
\ No newline at end of file
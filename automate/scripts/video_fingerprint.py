@@ -0,0 +1,375 @@
+import sys
+
+import os
+import re
+import json
+import shutil
+import sqlite3
+import datetime
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+if __name__ == "__main__":
+    import content_registry
+else:
+    try:
+        from scripts import content_registry
+    except ImportError:
+        import content_registry # Imported by a script run from this folder
+
+# --- Constants ---
+# Shared by all categories: <project>/data/video_fingerprints.sqlite
+INDEX_FILE_NAME = "video_fingerprints.sqlite"
+# Frames sampled per video, at these fractions of its duration (same spots in a re-encode)
+SAMPLE_POSITIONS = (0.1, 0.3, 0.5, 0.7, 0.9)
+FRAME_SIZE = 32 # Frames are scaled to 32x32 grey before the DCT
+HASH_SIZE = 8   # Lowest 8x8 DCT coefficients -> 64-bit hash per frame
+FINGERPRINT_BITS = len(SAMPLE_POSITIONS) * HASH_SIZE * HASH_SIZE
+# Default for global_settings "fingerprint_max_distance": share of differing bits still counted as the same video
+DEFAULT_MAX_DISTANCE = 0.15
+FFMPEG_TIMEOUT = 120
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    path        TEXT PRIMARY KEY,
+    category    TEXT,
+    location    TEXT,
+    size        INTEGER NOT NULL,
+    mtime       REAL NOT NULL,
+    fingerprint BLOB,
+    created_at  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_location ON fingerprints(location);
+"""
+
+# --- Helper Functions ---
+
+def load_json(file_path):
+    if not os.path.exists(file_path):
+        print(f"[Error] File not found: {file_path}", flush=True)
+        return None
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[Error] Could not read file {file_path}: {e}", flush=True)
+        return None
+
+def get_index_path(controller_path):
+    """Fingerprint index for a controller.json (in the project's data folder)."""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(controller_path)))
+    return os.path.join(project_root, "data", INDEX_FILE_NAME)
+
+def resolve_ffmpeg(settings):
+    """ffmpeg from global_settings "ffmpeg_path", else the one on PATH. None if neither exists."""
+    ffmpeg_path = (settings or {}).get("ffmpeg_path") or "ffmpeg"
+    if os.path.isfile(ffmpeg_path):
+        return ffmpeg_path
+    return shutil.which(ffmpeg_path)
+
+def get_video_duration(video_path, ffmpeg_path):
+    """Duration in seconds from ffmpeg's input banner, or None."""
+    try:
+        result = subprocess.run([ffmpeg_path, "-hide_banner", "-i", video_path],
+                                capture_output=True, text=True, errors="replace", timeout=FFMPEG_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if not match:
+        return None
+    return int(match.group(1)) * 3600 + int(match.group(2)) * 60 + float(match.group(3))
+
+def extract_sample_frames(video_path, ffmpeg_path):
+    """
+    Grabs one frame at each SAMPLE_POSITIONS point (input seeking, so only a few
+    frames are decoded) as an array (frames, 32, 32) of grey levels, in a single
+    ffmpeg run. None if the video can't be read.
+    """
+    duration = get_video_duration(video_path, ffmpeg_path)
+    if not duration:
+        return None
+    command = [ffmpeg_path, "-v", "error", "-nostdin"]
+    for position in SAMPLE_POSITIONS:
+        command += ["-ss", f"{duration * position:.3f}", "-i", video_path]
+    chains = [f"[{i}:v]trim=end_frame=1,scale={FRAME_SIZE}:{FRAME_SIZE}:flags=area,format=gray,setsar=1[f{i}]"
+              for i in range(len(SAMPLE_POSITIONS))]
+    inputs = "".join(f"[f{i}]" for i in range(len(SAMPLE_POSITIONS)))
+    graph = ";".join(chains) + f";{inputs}concat=n={len(SAMPLE_POSITIONS)}:v=1:a=0[out]"
+    command += ["-filter_complex", graph, "-map", "[out]", "-f", "rawvideo", "pipe:1"]
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=FFMPEG_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    frame_bytes = FRAME_SIZE * FRAME_SIZE
+    count = len(result.stdout) // frame_bytes
+    if count == 0:
+        return None
+    frames = np.frombuffer(result.stdout[:count * frame_bytes], dtype=np.uint8).reshape(count, FRAME_SIZE, FRAME_SIZE)
+    if count < len(SAMPLE_POSITIONS):
+        # Very short clip: repeat the last frame so every fingerprint has the same length
+        frames = np.concatenate([frames, np.repeat(frames[-1:], len(SAMPLE_POSITIONS) - count, axis=0)])
+    return frames
+
+def _dct_matrix(size):
+    """Orthonormal DCT-II basis, so a 2D DCT is two matrix products."""
+    n = np.arange(size)
+    matrix = np.sqrt(2.0 / size) * np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+def compute_phash(frames):
+    """
+    64-bit perceptual hash per frame, for all frames at once: 2D DCT, keep the
+    8x8 lowest frequencies, set bits above the median (DC term left out).
+    Returns the packed bits as bytes.
+    """
+    dct = _dct_matrix(FRAME_SIZE)
+    coefficients = dct @ frames.astype(np.float32) @ dct.T
+    low = coefficients[:, :HASH_SIZE, :HASH_SIZE].reshape(len(frames), -1)
+    medians = np.median(low[:, 1:], axis=1, keepdims=True)
+    return np.packbits(low > medians, axis=1).tobytes()
+
+def compute_fingerprint(video_path, ffmpeg_path):
+    """Fingerprint (bytes) of a video file, or None if it can't be read."""
+    frames = extract_sample_frames(video_path, ffmpeg_path)
+    return compute_phash(frames) if frames is not None else None
+
+# Set bits per byte value, for Hamming distances on packed bits
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint16) if NUMPY_AVAILABLE else None
+
+def hamming_distances(fingerprint, matrix):
+    """Differing bits between one fingerprint and every row of a (n, bytes) uint8 matrix."""
+    query = np.frombuffer(fingerprint, dtype=np.uint8)
+    return POPCOUNT[np.bitwise_xor(matrix, query)].sum(axis=1)
+
+# --- Index ---
+
+class FingerprintIndex:
+    """
+    Fingerprints of every video in the categories' download/upload folders
+    (path -> fingerprint, plus size/mtime so unchanged files are skipped).
+    Matching loads all fingerprints into one NumPy matrix and compares a file
+    against all of them in a single vectorised pass. With read_only=True the
+    index is only read (never created or updated).
+    """
+
+    def __init__(self, index_path, read_only=False):
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        if read_only:
+            self._conn = sqlite3.connect(Path(index_path).as_uri() + "?mode=ro", uri=True, check_same_thread=False)
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+        self._conn = sqlite3.connect(index_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def update(self, folders, ffmpeg_path, workers=DEFAULT_WORKERS):
+        """
+        Fingerprints new or changed videos in `folders` [(category, location, folder), ...]
+        and forgets ones that are gone. A file moved between folders (e.g. after upload)
+        keeps its fingerprint. Returns (files, computed).
+        """
+        with self._lock:
+            known = {row[0]: row[1:] for row in
+                     self._conn.execute("SELECT path, size, mtime, fingerprint FROM fingerprints")}
+        current, todo = {}, []
+        for category, location, folder in folders:
+            if not os.path.isdir(folder):
+                continue
+            for entry in os.scandir(folder):
+                if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in content_registry.VIDEO_EXTENSIONS:
+                    continue
+                path = os.path.abspath(entry.path)
+                stat = entry.stat()
+                current[path] = (category, location, stat.st_size, stat.st_mtime)
+                previous = known.get(path)
+                if not previous or previous[0] != stat.st_size or previous[1] != stat.st_mtime:
+                    todo.append(path)
+
+        # Rows to forget: files gone from the scanned folders, or from disk altogether
+        scanned = tuple(os.path.join(folder, "") for _, _, folder in folders)
+        stale = [path for path in known if path not in current
+                 and (path.startswith(scanned) or not os.path.exists(path))]
+        # Moved files: same name, size and mtime as a forgotten row
+        gone = {(os.path.basename(path), known[path][0], known[path][1]): known[path][2] for path in stale}
+        rows, computed = [], 0
+
+        def fingerprint(path):
+            category, location, size, mtime = current[path]
+            moved = gone.get((os.path.basename(path), size, mtime))
+            return path, moved if moved is not None else compute_fingerprint(path, ffmpeg_path), moved is not None
+
+        if todo:
+            reused = sum(1 for path in todo if (os.path.basename(path),) + current[path][2:] in gone)
+            if len(todo) > reused:
+                print(f"[Fingerprint] {len(todo) - reused} videos to fingerprint...", flush=True)
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                for path, value, moved in executor.map(fingerprint, todo):
+                    if value is None:
+                        print(f"[Warn] Could not fingerprint {os.path.basename(path)}.", flush=True)
+                    computed += 0 if moved else 1
+                    category, location, size, mtime = current[path]
+                    rows.append((path, category, location, size, mtime, value,
+                                 datetime.datetime.now().isoformat(timespec="seconds")))
+
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM fingerprints WHERE path = ?", [(path,) for path in stale])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO fingerprints (path, category, location, size, mtime, fingerprint, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            # Category/location of unchanged files may differ if folders were re-assigned
+            self._conn.executemany("UPDATE fingerprints SET category = ?, location = ? WHERE path = ?",
+                                   [(value[0], value[1], path) for path, value in current.items()])
+        return len(current), computed
+
+    def get_fingerprint(self, path, stat=None):
+        """Stored fingerprint of a file; with `stat`, only if its size/mtime still match."""
+        with self._lock:
+            row = self._conn.execute("SELECT fingerprint, size, mtime FROM fingerprints WHERE path = ?",
+                                     (os.path.abspath(path),)).fetchone()
+        if not row or (stat and (row[1], row[2]) != (stat.st_size, stat.st_mtime)):
+            return None
+        return row[0]
+
+    def load_matrix(self, location=None):
+        """(paths, categories, matrix) of all fingerprints, optionally only one location."""
+        query = "SELECT path, category, fingerprint FROM fingerprints WHERE fingerprint IS NOT NULL"
+        params = ()
+        if location:
+            query += " AND location = ?"
+            params = (location,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        rows = [row for row in rows if len(row[2]) == FINGERPRINT_BITS // 8]
+        if not rows:
+            return [], [], np.zeros((0, FINGERPRINT_BITS // 8), dtype=np.uint8)
+        matrix = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.uint8).reshape(len(rows), -1)
+        return [row[0] for row in rows], [row[1] for row in rows], matrix
+
+# --- Duplicate Check ---
+
+def match_source_folder(index, source_dir, max_distance, check_stat=False):
+    """
+    Compares every video in `source_dir` with the uploaded fingerprints in `index`.
+    Returns (matches, pending): matches is {filename: [(path, category, distance), ...]}
+    with the closest first, pending the files that have no (up-to-date) fingerprint.
+    """
+    paths, categories, matrix = index.load_matrix("uploaded")
+    limit = int(max_distance * FINGERPRINT_BITS)
+    matches, pending = {}, []
+    for entry in sorted(os.scandir(source_dir), key=lambda e: e.name):
+        if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in content_registry.VIDEO_EXTENSIONS:
+            continue
+        fingerprint = index.get_fingerprint(entry.path, entry.stat() if check_stat else None)
+        if not fingerprint or len(fingerprint) != matrix.shape[1]:
+            pending.append(entry.name)
+            continue
+        if not paths:
+            continue
+        distances = hamming_distances(fingerprint, matrix)
+        close = np.flatnonzero(distances <= limit)
+        if close.size:
+            close = close[np.argsort(distances[close])]
+            matches[entry.name] = [(paths[i], categories[i], float(distances[i]) / FINGERPRINT_BITS) for i in close]
+    return matches, pending
+
+def get_source_dir(controller_data, category):
+    source_dir = controller_data.get("categories", {}).get(category, {}).get("upload_source_dir")
+    return source_dir if source_dir and os.path.isdir(source_dir) else None
+
+def find_likely_duplicates(controller_data, category, controller_path, max_distance=None):
+    """
+    Fingerprints `category`'s upload_source_dir and everything already uploaded
+    (all categories), then checks the former against the latter. Returns
+    {filename: [(path, category, distance), ...]} with the closest matches first;
+    distance is the share of differing bits.
+    """
+    if not NUMPY_AVAILABLE:
+        print("[Warn] numpy not installed; skipping duplicate check.", flush=True)
+        return {}
+    settings = controller_data.get("global_settings", {})
+    ffmpeg_path = resolve_ffmpeg(settings)
+    if not ffmpeg_path:
+        print("[Warn] ffmpeg not found (global_settings 'ffmpeg_path'); skipping duplicate check.", flush=True)
+        return {}
+    max_distance = max_distance if max_distance is not None else settings.get("fingerprint_max_distance", DEFAULT_MAX_DISTANCE)
+    source_dir = get_source_dir(controller_data, category)
+    if not source_dir:
+        return {}
+
+    folders = [(cat, location, folder) for cat, location, folder in content_registry.get_category_folders(controller_data)
+               if location == "uploaded"]
+    folders.append((category, "source", os.path.abspath(source_dir)))
+    index = FingerprintIndex(get_index_path(controller_path))
+    try:
+        index.update(folders, ffmpeg_path)
+        return match_source_folder(index, source_dir, max_distance)[0]
+    finally:
+        index.close()
+
+def read_likely_duplicates(controller_data, category, controller_path, max_distance=None):
+    """
+    Same check as find_likely_duplicates from the fingerprints already stored
+    (index opened read-only, no ffmpeg), so it is quick enough for the web controller.
+    Returns (matches, pending); pending files wait for the "Check Duplicate Uploads" task.
+    """
+    source_dir = get_source_dir(controller_data, category)
+    if not source_dir:
+        return {}, []
+    index_path = get_index_path(controller_path)
+    if not NUMPY_AVAILABLE or not os.path.exists(index_path):
+        return {}, sorted(entry.name for entry in os.scandir(source_dir) if entry.is_file()
+                          and os.path.splitext(entry.name)[1].lower() in content_registry.VIDEO_EXTENSIONS)
+    settings = controller_data.get("global_settings", {})
+    max_distance = max_distance if max_distance is not None else settings.get("fingerprint_max_distance", DEFAULT_MAX_DISTANCE)
+    index = FingerprintIndex(index_path, read_only=True)
+    try:
+        return match_source_folder(index, source_dir, max_distance, check_stat=True)
+    finally:
+        index.close()
+
+def main(controller_path, category=None):
+    controller_data = load_json(controller_path)
+    if not controller_data: return
+    if not NUMPY_AVAILABLE:
+        print("[Error] numpy is required: pip install numpy", flush=True)
+        return
+    categories = [category] if category else list(controller_data.get("categories", {}))
+    for name in categories:
+        print(f"--- Checking {name} ---", flush=True)
+        matches = find_likely_duplicates(controller_data, name, controller_path)
+        for filename, found in matches.items():
+            path, other_category, distance = found[0]
+            print(f"[Dup] {filename} looks like {other_category}/{os.path.basename(path)} "
+                  f"({distance:.0%} different)" + (f", +{len(found) - 1} more" if len(found) > 1 else ""), flush=True)
+        print(f"[Info] {len(matches)} likely duplicates waiting in {name}'s upload folder.", flush=True)
+
+if __name__ == "__main__":
+    # FORCE UTF-8 ENCODING FOR WINDOWS CONSOLE (only when run directly: the web controller imports this module)
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+    except AttributeError:
+        pass
+
+    parser = argparse.ArgumentParser(description="Fingerprints videos and flags uploads that match already uploaded ones.")
+    parser.add_argument("--controller", default="../controller/controller.json")
+    parser.add_argument("--category", default=None, help="Only check this category (default: all).")
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    main(os.path.abspath(os.path.join(script_dir, args.controller)), args.category)
@@ -0,0 +1,215 @@
+import sys
+# FORCE UTF-8 ENCODING FOR WINDOWS CONSOLE
+try:
+    sys.stdout.reconfigure(encoding='utf-8')
+except AttributeError:
+    pass
+
+import os
+import re
+import json
+import time
+import shutil
+import struct
+import argparse
+import subprocess
+
+# --- Constants ---
+# Containers that get the faststart remux; others are only verified
+REMUX_EXTENSIONS = {'.mp4', '.mov', '.m4v'}
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.webm', '.mpeg', '.mpg', '.3gp'}
+# Corrupt downloads are moved here (inside the download folder, so upload and gallery lists skip them)
+QUARANTINE_DIR_NAME = "_quarantine"
+REMUX_TEMP_PATTERN = ".{}.remux.mp4"
+FFMPEG_TIMEOUT = 300
+# ffmpeg messages that mean the input is damaged even if it exits with 0
+CORRUPTION_PATTERN = re.compile(r"partial file|moov atom not found|invalid data found|truncat|error while decoding",
+                                re.IGNORECASE)
+
+# --- Helper Functions ---
+
+def load_json(file_path):
+    if not os.path.exists(file_path):
+        print(f"[Error] File not found: {file_path}", flush=True)
+        return None
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[Error] Could not read file {file_path}: {e}", flush=True)
+        return None
+
+def resolve_tools(settings):
+    """
+    (ffmpeg, ffprobe) from global_settings "ffmpeg_path" (ffprobe is looked for
+    beside it) or PATH. Either may be None.
+    """
+    configured = (settings or {}).get("ffmpeg_path") or "ffmpeg"
+    ffmpeg_path = configured if os.path.isfile(configured) else shutil.which(configured)
+    ffprobe_path = None
+    if ffmpeg_path:
+        folder, name = os.path.split(ffmpeg_path)
+        candidate = os.path.join(folder, name.replace("ffmpeg", "ffprobe"))
+        if candidate != ffmpeg_path and os.path.isfile(candidate):
+            ffprobe_path = candidate
+    return ffmpeg_path, ffprobe_path or shutil.which("ffprobe")
+
+def read_top_level_atoms(file_path):
+    """Order of the top-level MP4 boxes (e.g. ['ftyp', 'mdat', 'moov']); [] if unreadable."""
+    atoms = []
+    try:
+        with open(file_path, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            position = 0
+            while position + 8 <= file_size:
+                f.seek(position)
+                size, kind = struct.unpack(">I4s", f.read(8))
+                if size == 1:
+                    size = struct.unpack(">Q", f.read(8))[0]
+                elif size == 0:
+                    size = file_size - position
+                if size < 8:
+                    break
+                atoms.append(kind.decode("latin-1"))
+                position += size
+    except (OSError, struct.error):
+        return []
+    return atoms
+
+def probe_video(file_path, ffmpeg_path, ffprobe_path=None):
+    """
+    Reads duration and stream types. Returns (info, error): info is
+    {"duration", "video", "audio", "other"} (stream counts), error a reason if unusable.
+    """
+    if ffprobe_path:
+        command = [ffprobe_path, "-v", "error", "-show_entries", "format=duration:stream=codec_type",
+                   "-of", "json", file_path]
+    else:
+        command = [ffmpeg_path, "-hide_banner", "-i", file_path]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, errors="replace", timeout=FFMPEG_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return None, f"probe failed: {e}"
+
+    if ffprobe_path:
+        if result.returncode != 0:
+            return None, (result.stderr.strip().splitlines() or ["ffprobe failed"])[-1]
+        try:
+            data = json.loads(result.stdout or "{}")
+        except ValueError:
+            return None, "unreadable ffprobe output"
+        types = [stream.get("codec_type") for stream in data.get("streams", [])]
+        duration = float(data.get("format", {}).get("duration") or 0)
+    else:
+        if CORRUPTION_PATTERN.search(result.stderr):
+            return None, CORRUPTION_PATTERN.search(result.stderr).group(0)
+        types = [match.lower() for match in re.findall(r"Stream #\S+.*?: (Video|Audio|Data|Subtitle)", result.stderr)]
+        match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+        duration = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + float(match.group(3)) if match else 0
+
+    info = {"duration": duration, "video": types.count("video"), "audio": types.count("audio"),
+            "other": len(types) - types.count("video") - types.count("audio")}
+    if not info["video"]:
+        return info, "no video stream"
+    if duration <= 0:
+        return info, "no duration"
+    return info, None
+
+def remux_faststart(file_path, ffmpeg_path):
+    """
+    Rewrites an MP4 without re-encoding: moov atom first (instant playback),
+    only the first video and audio stream, no metadata/data/subtitle streams.
+    Reading every packet doubles as the integrity check. Returns an error or None.
+    """
+    folder, name = os.path.split(file_path)
+    temp_path = os.path.join(folder, REMUX_TEMP_PATTERN.format(os.path.splitext(name)[0]))
+    command = [ffmpeg_path, "-v", "error", "-nostdin", "-y", "-i", file_path,
+               "-map", "0:v:0", "-map", "0:a:0?", "-c", "copy",
+               "-map_metadata", "-1", "-map_chapters", "-1", "-dn", "-sn",
+               "-fflags", "+bitexact", "-movflags", "+faststart", "-f", "mp4", temp_path]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, errors="replace", timeout=FFMPEG_TIMEOUT)
+        corruption = CORRUPTION_PATTERN.search(result.stderr)
+        if result.returncode != 0 or corruption:
+            reason = corruption.group(0) if corruption else (result.stderr.strip().splitlines() or ["remux failed"])[-1]
+            return reason
+        stat = os.stat(file_path)
+        os.replace(temp_path, file_path)
+        os.utime(file_path, (time.time(), stat.st_mtime)) # Keep the post date
+        return None
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return f"remux failed: {e}"
+    finally:
+        if os.path.exists(temp_path):
+            try: os.remove(temp_path)
+            except OSError: pass
+
+def quarantine_file(file_path):
+    """Moves a broken file into the folder's _quarantine subfolder. Returns the new path."""
+    folder, name = os.path.split(file_path)
+    quarantine_dir = os.path.join(folder, QUARANTINE_DIR_NAME)
+    os.makedirs(quarantine_dir, exist_ok=True)
+    target = os.path.join(quarantine_dir, name)
+    if os.path.exists(target):
+        stem, ext = os.path.splitext(name)
+        target = os.path.join(quarantine_dir, f"{stem}_{int(time.time())}{ext}")
+    shutil.move(file_path, target)
+    return target
+
+def normalize_video(file_path, ffmpeg_path, ffprobe_path=None):
+    """
+    Verifies a downloaded video and remuxes it for upload/playback. Returns
+    (ok, message): ok False means the file is corrupt (not moved; see quarantine_file).
+    """
+    info, error = probe_video(file_path, ffmpeg_path, ffprobe_path)
+    if error:
+        return False, error
+    if os.path.splitext(file_path)[1].lower() not in REMUX_EXTENSIONS:
+        return True, "verified"
+    atoms = read_top_level_atoms(file_path)
+    moov_last = "moov" in atoms and "mdat" in atoms and atoms.index("moov") > atoms.index("mdat")
+    error = remux_faststart(file_path, ffmpeg_path)
+    if error:
+        return False, error
+    changes = (["faststart"] if moov_last else []) + ([f"dropped {info['other']} extra stream(s)"] if info["other"] else [])
+    return True, ", ".join(changes) or "verified"
+
+def main(category_name, controller_path):
+    """Normalizes every video already in a category's download folder."""
+    controller_data = load_json(controller_path)
+    if not controller_data: return
+    category_config = controller_data.get("categories", {}).get(category_name)
+    if not category_config:
+        print(f"[Error] Category '{category_name}' not found.", flush=True)
+        return
+    folder = category_config.get("download_target_dir")
+    if not folder or not os.path.isdir(folder):
+        print(f"[Info] No download folder for {category_name}.", flush=True)
+        return
+    ffmpeg_path, ffprobe_path = resolve_tools(controller_data.get("global_settings"))
+    if not ffmpeg_path:
+        print("[Error] ffmpeg not found (global_settings 'ffmpeg_path').", flush=True)
+        return
+
+    ok_count, bad_count = 0, 0
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if name.startswith(".") or not os.path.isfile(path) or os.path.splitext(name)[1].lower() not in VIDEO_EXTENSIONS:
+            continue
+        ok, message = normalize_video(path, ffmpeg_path, ffprobe_path)
+        if ok:
+            ok_count += 1
+            print(f"[OK] {name}: {message}", flush=True)
+        else:
+            bad_count += 1
+            print(f"[Quarantine] {name}: {message} -> {os.path.relpath(quarantine_file(path), folder)}", flush=True)
+    print(f"\n--- Finished. OK: {ok_count}, Quarantined: {bad_count} ---", flush=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifies and faststart-remuxes the videos in a category's download folder.")
+    parser.add_argument("--category", required=True)
+    parser.add_argument("--controller", default="../controller/controller.json")
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    main(args.category, os.path.abspath(os.path.join(script_dir, args.controller)))